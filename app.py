@@ -1,11 +1,13 @@
 from flask import Flask
 from blueprints.main_bp.main_routes import routes_bp
 from blueprints.llm_bp.llm_routes import llm_bp
+from services import instrumentation
 
 app = Flask(__name__)
 app.register_blueprint(routes_bp)
 app.register_blueprint(llm_bp)
 app.config['WTF_CSRF_ENABLED'] = False
+instrumentation.init_app(app)
 
 if __name__ == "__main__":
     app.run(debug=True)
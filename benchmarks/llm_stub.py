@@ -0,0 +1,92 @@
+import asyncio
+import hashlib
+import json
+import random
+import time
+from types import SimpleNamespace
+
+STUB_EXERCISES = ["Bench Press", "Push Up", "Squat", "Deadlift", "Pull Up", "Lunge", "Plank", "Row", "Curl", "Dip"]
+
+
+def stub_response(prompt):
+    # Same prompt, same workout: runs are comparable and the LLM cache behaves
+    # exactly as it would with repeated real requests.
+    rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+    names = rng.sample(STUB_EXERCISES, rng.randint(3, 6))
+    return json.dumps({name: [rng.randint(2, 5), rng.randint(5, 8), rng.randint(10, 15)] for name in names})
+
+
+def _usage(prompt, content):
+    prompt_tokens = len(prompt) // 4
+    completion_tokens = len(content) // 4
+    return SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                           total_tokens=prompt_tokens + completion_tokens)
+
+
+def _completion(prompt, content):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=_usage(prompt, content),
+    )
+
+
+def _stream(prompt, content, latency, chunk_size=8):
+    # Time to first token is half the latency; the rest is spread over chunks.
+    chunks = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)]
+    time.sleep(latency / 2)
+    for text in chunks:
+        time.sleep(latency / 2 / len(chunks))
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], x_groq=None)
+    yield SimpleNamespace(choices=[], x_groq=SimpleNamespace(usage=_usage(prompt, content)))
+
+
+class _Completions:
+    def __init__(self, stub):
+        self._stub = stub
+
+    def create(self, messages, model=None, stream=False, **kwargs):
+        prompt = messages[-1]["content"]
+        content = stub_response(prompt)
+        self._stub.calls += 1
+        if stream:
+            return _stream(prompt, content, self._stub.next_latency())
+        time.sleep(self._stub.next_latency())
+        return _completion(prompt, content)
+
+
+class _AsyncCompletions(_Completions):
+    async def create(self, messages, model=None, stream=False, **kwargs):
+        prompt = messages[-1]["content"]
+        self._stub.calls += 1
+        await asyncio.sleep(self._stub.next_latency())
+        return _completion(prompt, stub_response(prompt))
+
+
+class StubGroq:
+    # Drop-in for the parts of groq.Groq / groq.AsyncGroq the app uses.
+
+    def __init__(self, latency=0.5, jitter=0.0, seed=0, is_async=False):
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = 0
+        self._rng = random.Random(seed)
+        completions = _AsyncCompletions(self) if is_async else _Completions(self)
+        self.chat = SimpleNamespace(completions=completions)
+
+    def next_latency(self):
+        if not self.jitter:
+            return self.latency
+        return max(0.0, self._rng.uniform(self.latency - self.jitter, self.latency + self.jitter))
+
+
+def install(latency=0.5, jitter=0.0, seed=0):
+    # Points every Groq call site at the stub. Returns (sync stub, async stub).
+    import configs.config as config
+    from services.async_llm import generation_service
+
+    sync_stub = StubGroq(latency, jitter, seed)
+    async_stub = StubGroq(latency, jitter, seed, is_async=True)
+    config._groq_client = sync_stub
+    generation_service._ensure_started()
+    generation_service._client = async_stub
+    return sync_stub, async_stub
@@ -0,0 +1,257 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from configs.config import get_db_connection
+from benchmarks import llm_stub
+from benchmarks.seed import MUSCLES, USERNAME_PREFIX, EXERCISE_PREFIX
+
+NO_CACHE = {"Cache-Control": "no-cache"}
+
+
+class Fixtures:
+    # Ids of seeded rows for requests to read, cycled round-robin so requests
+    # spread over many users instead of hammering one row.
+
+    def __init__(self, sample_size=200):
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT user_id::text FROM users WHERE username LIKE %s ORDER BY user_id LIMIT %s;",
+                            (USERNAME_PREFIX + "%", sample_size))
+                self.user_ids = [row[0] for row in cur.fetchall()]
+                cur.execute("SELECT workout_id::text FROM workouts WHERE user_id = ANY(%s::uuid[]) ORDER BY workout_id LIMIT %s;",
+                            (self.user_ids, sample_size))
+                self.workout_ids = [row[0] for row in cur.fetchall()]
+                cur.execute("SELECT exercise_name FROM exercises WHERE exercise_name LIKE %s ORDER BY exercise_name LIMIT %s;",
+                            (EXERCISE_PREFIX + "%", sample_size))
+                self.exercise_names = [row[0] for row in cur.fetchall()]
+        if not self.user_ids:
+            raise RuntimeError("No seeded users found; run `python -m benchmarks.seed` first.")
+        self._cycles = {}
+        self._lock = threading.Lock()
+
+    def next(self, kind):
+        with self._lock:
+            cycle = self._cycles.get(kind)
+            if cycle is None:
+                cycle = self._cycles[kind] = itertools.cycle(getattr(self, kind))
+            return next(cycle)
+
+    def targets(self, i):
+        return [MUSCLES[i % len(MUSCLES)], MUSCLES[(i * 7 + 3) % len(MUSCLES)]]
+
+
+def _throwaway_user(client):
+    # Untimed setup for routes that destroy what they touch.
+    response = client.post("/", data={
+        "height": "180", "weight": "80", "plan": "Maintain", "workout": "chest", "activity": "Active",
+        "username": f"{USERNAME_PREFIX}tmp_{uuid.uuid4().hex}", "password": "bench",
+    })
+    return response.get_json()
+
+
+# name -> (kind, request builder). kind is "read", "write" (adds rows) or
+# "llm" (calls the stub). Builders take (client, fixtures, i) and return the response.
+SCENARIOS = {
+    "GET /": ("read", lambda c, f, i: c.get("/")),
+    "POST /": ("llm", lambda c, f, i: c.post("/", headers=NO_CACHE, data={
+        "height": "180", "weight": "80", "plan": "Maintain", "workout": ", ".join(f.targets(i)), "activity": "Active",
+        "username": f"{USERNAME_PREFIX}new_{uuid.uuid4().hex}", "password": "bench",
+    })),
+    "GET /users/<user_id>": ("read", lambda c, f, i: c.get(f"/users/{f.next('user_ids')}")),
+    "PUT /users/<user_id>": ("write", lambda c, f, i: c.put(f"/users/{f.next('user_ids')}", json={"activity": "Active"})),
+    "DELETE /users/<user_id>": ("write", None),
+    "POST /metrics": ("write", lambda c, f, i: c.post("/metrics", json={"user_id": f.next("user_ids"), "weight": 80 + i % 10})),
+    "POST /metrics/bulk": ("write", lambda c, f, i: c.post("/metrics/bulk", json=[
+        {"user_id": f.next("user_ids"), "weight": 80, "recorded_at": f"2020-01-01T00:{i % 60:02d}:{j:02d}"} for j in range(50)
+    ])),
+    "GET /metrics/latest/<user_id>": ("read", lambda c, f, i: c.get(f"/metrics/latest/{f.next('user_ids')}")),
+    "GET /metrics/height/latest/<user_id>": ("read", lambda c, f, i: c.get(f"/metrics/height/latest/{f.next('user_ids')}")),
+    "GET /metrics/weight/latest/<user_id>": ("read", lambda c, f, i: c.get(f"/metrics/weight/latest/{f.next('user_ids')}")),
+    "GET /metrics/<user_id>/series": ("read", lambda c, f, i: c.get(f"/metrics/{f.next('user_ids')}/series?bucket=week&agg=avg,last")),
+    "PUT /metrics/height/<user_id>": ("write", lambda c, f, i: c.put(f"/metrics/height/{f.next('user_ids')}",
+                                                                     json={"new_height": 180, "timestamp": datetime.now().isoformat()})),
+    "PUT /metrics/weight/<user_id>": ("write", lambda c, f, i: c.put(f"/metrics/weight/{f.next('user_ids')}",
+                                                                     json={"new_weight": 80, "timestamp": datetime.now().isoformat()})),
+    "DELETE /metrics/<user_id>": ("write", None),
+    "POST /workouts/generate/<user_id>": ("llm", lambda c, f, i: c.post(f"/workouts/generate/{f.next('user_ids')}", headers=NO_CACHE, json={
+        "height": 180, "weight": 80, "plan": "Maintain", "workout": ", ".join(f.targets(i)), "activity": "Active",
+    })),
+    "POST /workouts/generate/<user_id>/jobs": ("llm", lambda c, f, i: c.post(f"/workouts/generate/{f.next('user_ids')}/jobs", headers=NO_CACHE, json={
+        "height": 180, "weight": 80, "plan": "Maintain", "workout": ", ".join(f.targets(i)), "activity": "Active",
+    })),
+    "GET /workouts/latest/<user_id>": ("read", lambda c, f, i: c.get(f"/workouts/latest/{f.next('user_ids')}")),
+    "GET /workouts/user/<user_id>": ("read", lambda c, f, i: c.get(f"/workouts/user/{f.next('user_ids')}?limit=20")),
+    "GET /workouts/<workout_id>": ("read", lambda c, f, i: c.get(f"/workouts/{f.next('workout_ids')}")),
+    "PUT /workouts/complete/<workout_id>": ("write", lambda c, f, i: c.put(f"/workouts/complete/{f.next('workout_ids')}")),
+    "DELETE /workouts/<workout_id>": ("write", None),
+    "DELETE /workouts/user/<user_id>": ("write", None),
+    "POST /exercises": ("write", lambda c, f, i: c.post("/exercises", json={
+        "name": f"{EXERCISE_PREFIX}new {uuid.uuid4().hex}", "primary_muscle_group": [f.targets(i)[0]],
+        "equipment": "body only", "instructions": "Benchmark.",
+    })),
+    "GET /exercises/<name>": ("read", lambda c, f, i: c.get(f"/exercises/{f.next('exercise_names')}")),
+    "POST /generate": ("llm", lambda c, f, i: c.post("/generate", headers=NO_CACHE, json={"user_id": f.next("user_ids"), "workout": f.targets(i)})),
+    "POST /generate/stream": ("llm", lambda c, f, i: c.post("/generate/stream", headers=NO_CACHE, json={"user_id": f.next("user_ids"), "workout": f.targets(i)})),
+    "POST /generate/batch": ("llm", lambda c, f, i: c.post("/generate/batch", headers=NO_CACHE, json={"items": [
+        {"user_id": f.next("user_ids"), "workout": f.targets(i + j)} for j in range(10)
+    ]})),
+    "GET /generate/stats": ("read", lambda c, f, i: c.get("/generate/stats")),
+    "POST /generate/jobs": ("llm", lambda c, f, i: c.post("/generate/jobs", headers=NO_CACHE, json={"user_id": f.next("user_ids"), "workout": f.targets(i)})),
+    "GET /jobs/<job_id>": ("read", None),
+    "generate_workout_with_rag": ("llm", None),
+}
+
+
+def _prepare(name, client, fixtures, count):
+    # Builders for scenarios that need per-request setup outside the timing.
+    if name == "DELETE /users/<user_id>":
+        targets = iter([_throwaway_user(client)["user_id"] for _ in range(count)])
+        return lambda c, f, i: c.delete(f"/users/{next(targets)}")
+    if name == "DELETE /metrics/<user_id>":
+        targets = iter([_throwaway_user(client)["user_id"] for _ in range(count)])
+        return lambda c, f, i: c.delete(f"/metrics/{next(targets)}")
+    if name == "DELETE /workouts/<workout_id>":
+        targets = iter([_throwaway_user(client)["workout_id"] for _ in range(count)])
+        return lambda c, f, i: c.delete(f"/workouts/{next(targets)}")
+    if name == "DELETE /workouts/user/<user_id>":
+        targets = iter([_throwaway_user(client)["user_id"] for _ in range(count)])
+        return lambda c, f, i: c.delete(f"/workouts/user/{next(targets)}")
+    if name == "GET /jobs/<job_id>":
+        job_ids = [client.post("/generate/jobs", json={"user_id": fixtures.next("user_ids"), "workout": fixtures.targets(i)}).get_json()["job_id"]
+                   for i in range(min(count, 50))]
+        return lambda c, f, i: c.get(f"/jobs/{job_ids[i % len(job_ids)]}")
+    if name == "generate_workout_with_rag":
+        from services.llm_processor import generate_workout_with_rag
+        return lambda c, f, i: generate_workout_with_rag(f.next("user_ids"), f.targets(i), use_cache=False)
+    return SCENARIOS[name][1]
+
+
+def _ok(result):
+    status = getattr(result, "status_code", None)
+    if status is not None:
+        return status < 400
+    return isinstance(result, tuple) and result[0] is not None
+
+
+def percentile(sorted_samples, q):
+    if not sorted_samples:
+        return None
+    index = min(len(sorted_samples) - 1, max(0, int(round(q / 100 * len(sorted_samples) + 0.5)) - 1))
+    return sorted_samples[index]
+
+
+def run_scenario(name, app, fixtures, requests_count, concurrency, warmup):
+    client = app.test_client()
+    builder = _prepare(name, client, fixtures, requests_count + warmup)
+    for i in range(warmup):
+        builder(client, fixtures, i)
+
+    def one(i):
+        local_client = app.test_client()
+        start = time.perf_counter()
+        try:
+            result = builder(local_client, fixtures, i)
+            if getattr(result, "is_streamed", False):
+                result.get_data()  # consume the stream so the timing covers it
+            ok = _ok(result)
+        except Exception:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(one, range(warmup, warmup + requests_count)))
+    wall = time.perf_counter() - start
+
+    samples = sorted(seconds * 1000 for seconds, _ in outcomes)
+    return {
+        "name": name,
+        "kind": SCENARIOS[name][0],
+        "requests": requests_count,
+        "errors": sum(not ok for _, ok in outcomes),
+        "concurrency": concurrency,
+        "throughput_rps": round(requests_count / wall, 2) if wall else None,
+        "mean_ms": round(sum(samples) / len(samples), 3),
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+        "max_ms": round(samples[-1], 3),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {r["name"]: r for r in json.load(f)["results"]}
+    for result in results:
+        before = baseline.get(result["name"])
+        if not before:
+            continue
+        delta = (result["p50_ms"] - before["p50_ms"]) / before["p50_ms"] * 100 if before["p50_ms"] else 0.0
+        print(f"{result['name']:45s} p50 {before['p50_ms']:9.2f} -> {result['p50_ms']:9.2f} ms ({delta:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark routes and the RAG pipeline against seeded data and a stub LLM.")
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="stub LLM latency in seconds")
+    parser.add_argument("--llm-jitter", type=float, default=0.0, help="uniform +/- jitter on the stub latency")
+    parser.add_argument("--only", nargs="*", help="scenario names (or substrings) to run")
+    parser.add_argument("--kinds", nargs="*", default=["read", "write", "llm"], help="read, write and/or llm")
+    parser.add_argument("--output", help="results file (default benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results file to print p50 deltas against")
+    args = parser.parse_args()
+
+    llm_stub.install(args.llm_latency, args.llm_jitter)
+    from app import app
+
+    fixtures = Fixtures()
+    names = [name for name, (kind, _) in SCENARIOS.items() if kind in args.kinds]
+    if args.only:
+        names = [name for name in names if any(pattern in name for pattern in args.only)]
+
+    started_at = datetime.now()
+    results = []
+    for name in names:
+        result = run_scenario(name, app, fixtures, args.requests, args.concurrency, args.warmup)
+        results.append(result)
+        print(f"{name:45s} {result['throughput_rps']:9.1f} req/s  p50 {result['p50_ms']:9.2f}  "
+              f"p95 {result['p95_ms']:9.2f}  p99 {result['p99_ms']:9.2f} ms  errors {result['errors']}")
+
+    output = args.output or os.path.join(os.path.dirname(__file__), "results", f"{started_at:%Y%m%dT%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "meta": {
+                "started_at": started_at.isoformat(),
+                "git_commit": _git_commit(),
+                "python": platform.python_version(),
+                "args": vars(args),
+                "fixture_users": len(fixtures.user_ids),
+            },
+            "results": results,
+        }, f, indent=2)
+    print(f"Results written to {output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
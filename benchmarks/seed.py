@@ -0,0 +1,151 @@
+import argparse
+import json
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from psycopg2.extras import execute_values
+from configs.config import get_db_connection
+
+MUSCLES = [
+    "abdominals", "abductors", "adductors", "biceps", "calves", "chest", "forearms", "glutes",
+    "hamstrings", "lats", "lower back", "middle back", "neck", "quadriceps", "shoulders", "traps", "triceps",
+]
+PLANS = ["Dirty Bulk", "Lean Bulk", "Standard Cut", "Aggressive Cut", "Body Recomposition", "Maintain"]
+ACTIVITIES = ["Sedentary", "Lightly Active", "Active", "Extremely Active"]
+EQUIPMENT = ["barbell", "dumbbell", "cable", "machine", "body only", "kettlebells", "bands"]
+LEVELS = ["beginner", "intermediate", "expert"]
+
+# Every seeded username starts with this, so --reset only removes seeded data.
+USERNAME_PREFIX = "bench_user_"
+EXERCISE_PREFIX = "Bench Exercise "
+BATCH_SIZE = 5000
+
+
+def _uuid(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _insert(cur, insert_sql, rows, template=None):
+    for i in range(0, len(rows), BATCH_SIZE):
+        execute_values(cur, insert_sql, rows[i:i + BATCH_SIZE], template=template, page_size=BATCH_SIZE)
+
+
+def synthetic_exercises(count, rng):
+    rows = []
+    for i in range(count):
+        primary = rng.sample(MUSCLES, 1)
+        secondary = rng.sample([m for m in MUSCLES if m not in primary], rng.randint(0, 2))
+        rows.append((
+            f"{EXERCISE_PREFIX}{i:05d}", primary, secondary, rng.choice(EQUIPMENT), rng.choice(LEVELS),
+            "Synthetic benchmark exercise.", None, False, None, datetime.now(),
+        ))
+    return rows
+
+
+def workout_doc(rng, exercise_names):
+    return [
+        {"Exercise": name, "Sets": rng.randint(2, 5), "Rep Range": [rng.randint(5, 8), rng.randint(10, 15)]}
+        for name in rng.sample(exercise_names, min(len(exercise_names), rng.randint(3, 6)))
+    ]
+
+
+def reset(cur):
+    # Metrics and workouts go with their users through ON DELETE CASCADE.
+    cur.execute("DELETE FROM users WHERE username LIKE %s;", (USERNAME_PREFIX + "%",))
+    cur.execute("DELETE FROM exercises WHERE exercise_name LIKE %s;", (EXERCISE_PREFIX + "%",))
+
+
+def seed(users, metrics_per_user, workouts_per_user, exercises, exercises_dir=None, seed_value=42, do_reset=False):
+    rng = random.Random(seed_value)
+    start = time.perf_counter()
+    now = datetime.now()
+    counts = {}
+
+    if exercises_dir:
+        from scripts.exercise_init import bulk_load
+        loaded, success = bulk_load(exercises_dir)
+        if not success:
+            raise RuntimeError(f"Failed to load exercises from {exercises_dir}")
+        counts["exercises_loaded"] = loaded
+
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            if do_reset:
+                reset(cur)
+
+            exercise_rows = synthetic_exercises(exercises, rng)
+            _insert(cur, """
+                INSERT INTO exercises (
+                    exercise_name, primary_muscle_group, secondary_muscle_group,
+                    equipment, difficulty, instructions, video_url, custom, user_id, created_at
+                ) VALUES %s ON CONFLICT (exercise_name) DO NOTHING;
+            """, exercise_rows)
+            counts["exercises"] = len(exercise_rows)
+            cur.execute("SELECT exercise_name FROM exercises WHERE NOT custom;")
+            exercise_names = [row[0] for row in cur.fetchall()] or ["Push Up"]
+
+            user_ids = [_uuid(rng) for _ in range(users)]
+            _insert(cur, """
+                INSERT INTO users (user_id, username, password_hash, created_at, activity_level, plan)
+                VALUES %s;
+            """, [
+                (user_id, f"{USERNAME_PREFIX}{seed_value}_{i}", "bench", now, rng.choice(ACTIVITIES), rng.choice(PLANS))
+                for i, user_id in enumerate(user_ids)
+            ])
+            counts["users"] = users
+
+            metric_rows = []
+            for user_id in user_ids:
+                height = rng.randint(150, 200)
+                weight = rng.uniform(50, 120)
+                for day in range(metrics_per_user):
+                    weight += rng.uniform(-0.5, 0.5)
+                    metric_rows.append((user_id, height, round(weight, 2), now - timedelta(days=metrics_per_user - day)))
+            _insert(cur, "INSERT INTO metrics (user_id, height, weight, recorded_at) VALUES %s;", metric_rows)
+            counts["metrics"] = len(metric_rows)
+
+            workout_rows = []
+            for user_id in user_ids:
+                for day in range(workouts_per_user):
+                    targets = ", ".join(rng.sample(MUSCLES, 2))
+                    doc = workout_doc(rng, exercise_names)
+                    raw = json.dumps({item["Exercise"]: [item["Sets"], *item["Rep Range"]] for item in doc})
+                    workout_rows.append((
+                        user_id, targets, "benchmark seed", raw, json.dumps(doc),
+                        now - timedelta(days=2 * (workouts_per_user - day)), "generated", None,
+                    ))
+            _insert(cur, """
+                INSERT INTO workouts (
+                    user_id, muscles_targeted, llm_prompt, llm_raw, parsed_workout, date_generated, status, completed_on
+                ) VALUES %s;
+            """, workout_rows)
+            counts["workouts"] = len(workout_rows)
+            cur.execute("ANALYZE users; ANALYZE metrics; ANALYZE workouts; ANALYZE exercises;")
+
+    counts["seconds"] = round(time.perf_counter() - start, 2)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed Postgres with synthetic benchmark data.")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--metrics-per-user", type=int, default=30)
+    parser.add_argument("--workouts-per-user", type=int, default=10)
+    parser.add_argument("--exercises", type=int, default=900, help="synthetic library exercises to add")
+    parser.add_argument("--exercises-dir", help="also load the real exercise library from this folder")
+    parser.add_argument("--seed", type=int, default=42, help="RNG seed; the same seed produces the same data")
+    parser.add_argument("--reset", action="store_true", help="delete previously seeded benchmark data first")
+    args = parser.parse_args()
+    try:
+        counts = seed(args.users, args.metrics_per_user, args.workouts_per_user, args.exercises,
+                      args.exercises_dir, args.seed, args.reset)
+    except Exception as e:
+        print(f"Seeding failed: {e}")
+        sys.exit(1)
+    print(json.dumps(counts))
+
+
+if __name__ == "__main__":
+    main()
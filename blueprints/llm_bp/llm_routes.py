@@ -1,7 +1,15 @@
-from flask import Blueprint, jsonify, request
-from configs.config import groq_client
+from flask import Blueprint, jsonify, request, Response, stream_with_context
+import json
+from concurrent.futures import Future
+from datetime import datetime
+from services import workout_services
 from services.helper import logger
-from services.llm_processor import generate_workout_with_rag
+from services.llm_processor import stream_workout_with_rag, get_generation_stats, GENERATION_STRATEGIES, DEFAULT_GENERATION_STRATEGY
+from services.async_llm import generation_service, generate_workout_with_rag_async, UserConcurrencyLimitError
+from services.llm_cache import cache_bypass_requested
+from services.workout_parser import parse_workout_response
+from services.job_services import job_queue
+from services.batch_services import generate_workouts_batch, MAX_BATCH_ITEMS
 
 llm_bp = Blueprint("llm_routes", __name__)
 
@@ -15,10 +23,163 @@ def create_workout():
     if not user_id or not workout or not isinstance(workout, list):
         return jsonify({"Client-side error": "user_id and workout (list of muscle groups) required"}), 400
 
-    response, prompt = generate_workout_with_rag(user_id, workout)
+    strategy = doc.get("strategy", DEFAULT_GENERATION_STRATEGY)
+    if strategy not in GENERATION_STRATEGIES:
+        return jsonify({"Client-side error": f"strategy must be one of {list(GENERATION_STRATEGIES)}"}), 400
+
+    use_cache = not (cache_bypass_requested(request) or doc.get("no_cache"))
+    if strategy == "speculative":
+        return _create_workout_speculative(user_id, workout, use_cache)
+
+    try:
+        response, prompt, model = generation_service.run(
+            generate_workout_with_rag_async, user_id, workout, user_id=user_id, use_cache=use_cache, strategy=strategy
+        )
+    except UserConcurrencyLimitError as e:
+        return jsonify({"error": str(e)}), 429
     if response is None:
         return jsonify({"error": prompt}), 500
+    parsed_workout, error = parse_workout_response(response)
+    if error:
+        return jsonify({"error": error, "llm_response": response}), 500
+    return jsonify({
+        "llm_response": response,
+        "llm_prompt": prompt,
+        "model": model,
+        "workout_details": parsed_workout
+    }), 200
+
+@llm_bp.route("/generate/stream", methods = ["POST"])
+def stream_workout():
+    doc = request.json
+    if not doc:
+        return jsonify({"Client-side error": "Invalid or empty JSON data"}), 400
+    user_id = doc.get("user_id")
+    workout = doc.get("workout")
+    if not user_id or not workout or not isinstance(workout, list):
+        return jsonify({"Client-side error": "user_id and workout (list of muscle groups) required"}), 400
+    use_cache = not (cache_bypass_requested(request) or doc.get("no_cache"))
+
+    def events():
+        for event, data in stream_workout_with_rag(user_id, workout, use_cache=use_cache):
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def _create_workout_speculative(user_id, workout, use_cache):
+    # The draft is stored and returned straight away; the refined version
+    # overwrites it once the background refinement finishes. A cache hit is
+    # already the refined version, so nothing is pending.
+    stored = Future()
+    refining = []
+
+    def store_refined(refined_response, model):
+        workout_id = stored.result(timeout=60)
+        if workout_id is None:
+            return
+        parsed_workout, error = parse_workout_response(refined_response)
+        if error:
+            logger.error(f"Keeping draft for workout {workout_id}; refinement was unusable: {error}")
+            return
+        workout_services.update_workout_output(workout_id, refined_response, parsed_workout, model)
+
+    workout_id = None
+    try:
+        response, prompt, model = generation_service.run(
+            generate_workout_with_rag_async, user_id, workout, user_id=user_id,
+            use_cache=use_cache, strategy="speculative", on_refined=store_refined,
+            on_refine_started=lambda: refining.append(True)
+        )
+        if response is None:
+            return jsonify({"error": prompt}), 500
+        parsed_workout, error = parse_workout_response(response)
+        if error:
+            return jsonify({"error": error, "llm_response": response}), 500
+        workout_result, success = workout_services.create_workout(
+            user_id, datetime.now(), ", ".join(workout), prompt, response, parsed_workout, "generated", None, model
+        )
+        if success:
+            workout_id = workout_result["_id"]
+    except UserConcurrencyLimitError as e:
+        return jsonify({"error": str(e)}), 429
+    finally:
+        stored.set_result(workout_id)
+
+    if workout_id is None:
+        return jsonify({"Server-side error": "Failed to store generated workout."}), 500
     return jsonify({
         "llm_response": response,
-        "llm_prompt": prompt
-    }), 200
\ No newline at end of file
+        "llm_prompt": prompt,
+        "model": model,
+        "workout_id": workout_id,
+        "refinement": "pending" if refining else "done"
+    }), 202
+
+@llm_bp.route("/generate/batch", methods = ["POST"])
+def create_workouts_batch():
+    doc = request.json
+    if not doc or not isinstance(doc.get("items"), list) or not doc["items"]:
+        return jsonify({"Client-side error": "items (list of {user_id, workout}) required"}), 400
+    items = doc["items"]
+    if len(items) > MAX_BATCH_ITEMS:
+        return jsonify({"Client-side error": f"at most {MAX_BATCH_ITEMS} items per batch"}), 400
+    pairs = []
+    for item in items:
+        if not isinstance(item, dict) or not item.get("user_id") or not item.get("workout") or not isinstance(item["workout"], list):
+            return jsonify({"Client-side error": "each item needs user_id and workout (list of muscle groups)"}), 400
+        pairs.append((item["user_id"], item["workout"]))
+
+    strategy = doc.get("strategy", DEFAULT_GENERATION_STRATEGY)
+    if strategy not in GENERATION_STRATEGIES:
+        return jsonify({"Client-side error": f"strategy must be one of {list(GENERATION_STRATEGIES)}"}), 400
+    use_cache = not (cache_bypass_requested(request) or doc.get("no_cache"))
+
+    results, success = generate_workouts_batch(pairs, use_cache=use_cache, strategy=strategy)
+    if not success:
+        return jsonify({"Server-side error": "Failed to load generation context."}), 500
+    succeeded = sum(r["status"] == "succeeded" for r in results)
+    return jsonify({
+        "results": results,
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded
+    }), 200
+
+@llm_bp.route("/generate/stats", methods = ["GET"])
+def generation_stats():
+    return jsonify(get_generation_stats()), 200
+
+@llm_bp.route("/generate/jobs", methods = ["POST"])
+def submit_generation_job():
+    doc = request.json
+    if not doc:
+        return jsonify({"Client-side error": "Invalid or empty JSON data"}), 400
+    user_id = doc.get("user_id")
+    workout = doc.get("workout")
+    if not user_id or not workout or not isinstance(workout, list):
+        return jsonify({"Client-side error": "user_id and workout (list of muscle groups) required"}), 400
+    strategy = doc.get("strategy", DEFAULT_GENERATION_STRATEGY)
+    if strategy == "speculative":
+        strategy = "draft-refine"  # the job is already asynchronous; store only the final workout
+    if strategy not in GENERATION_STRATEGIES:
+        return jsonify({"Client-side error": f"strategy must be one of {list(GENERATION_STRATEGIES)}"}), 400
+
+    payload = {
+        "user_id": user_id,
+        "workout": workout,
+        "strategy": strategy,
+        "use_cache": not (cache_bypass_requested(request) or doc.get("no_cache")),
+    }
+    idempotency_key = request.headers.get("Idempotency-Key") or doc.get("idempotency_key")
+    job, created = job_queue.submit("rag", payload, idempotency_key)
+    return jsonify(job), 202 if created else 200
+
+@llm_bp.route("/jobs/<job_id>", methods = ["GET"])
+def get_generation_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found."}), 404
+    return jsonify(job), 200
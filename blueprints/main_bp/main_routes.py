@@ -2,11 +2,12 @@ from flask import Blueprint, render_template, request, jsonify
 from datetime import datetime
 from services import user_services, metric_services, workout_services, exercise_services
 from services.helper import logger
-from services.llm_processor import generate_workout_llm_output
+from services.async_llm import generation_service, generate_workout_llm_output_async, UserConcurrencyLimitError
+from services.llm_cache import cache_bypass_requested
+from services.job_services import job_queue
+from services.workout_parser import parse_workout_response
 import json
-from ast import literal_eval
 from bcrypt import gensalt, hashpw
-import uuid
 
 routes_bp = Blueprint("routes", __name__)
 
@@ -44,65 +45,29 @@ def create():
           else:
                return jsonify({"Server-side error": "Failed when creating new user"}), 500
 
-          response, llm_prompt = generate_workout_llm_output(height, weight, plan, workout, activity)
+          use_cache = not (cache_bypass_requested(request) or request.form.get("no_cache"))
+          try:
+               response, llm_prompt, model = generation_service.run(
+                    generate_workout_llm_output_async, height, weight, plan, workout, activity,
+                    user_id=user_id, use_cache=use_cache
+               )
+          except UserConcurrencyLimitError as e:
+               return jsonify({"Client-side error": str(e)}), 429
           if response is None:
                return jsonify({"Server-side error": "Failed to generate workout from AI"}), 500
           
-          try:
-               workout_dict = json.loads(response)
-               if "error" in workout_dict:
-                    error_message = workout_dict["error"].get("message", "Unknown LLM API error")
-                    return jsonify({"LLM API Error": error_message}), 500
-               workout_doc = []
-               for k, v in workout_dict.items():
-                    to_enter = {
-                         "Exercise": "",
-                         "Sets": 0,
-                         "Rep Range": [0, 0]
-                    }
-                    try:
-                         parsed_setreps = v
-
-                         if isinstance(parsed_setreps, list) and len(parsed_setreps) == 3:
-                              try: 
-                                   sets = int(parsed_setreps[0])
-                                   rep_min = int(parsed_setreps[1])
-                                   rep_max = int(parsed_setreps[2])
-
-                                   to_enter["Exercise"] = k
-                                   to_enter["Sets"] = sets
-                                   to_enter["Rep Range"] = [rep_min, rep_max]
-                              except ValueError as ve:
-                                   logger.error(f"LLM output values were not convertible to int for exercise {k}: {v}. Error: {ve}", exc_info=True)
-                                   return jsonify({"LLM Parsing Error": "AI did not return numeric values"}), 500
-                         else:
-                              logger.error(f"LLM returned unintended list when formatting exercise {k}: {v}. Parsed: {parsed_setreps}")
-                              return jsonify({"LLM API Error": "Failed to parse exercises"}), 500
-                    except (ValueError, SyntaxError) as e:
-                         logger.error(f"Error {e} occurred when parsing LLM output")
-                         return jsonify({"LLM Parsing Error": "Could not parse exercises"}), 500
-                    except Exception as e:
-                         logger.critical(f"Unexpected error {e} when parsing LLM", exc_info=True)
-                         return jsonify({"Server-side error": "An unexpected error occurred when parsing exercises"}), 500
-
-                    workout_doc.append(to_enter)
-               
-               workout_result, success = workout_services.create_workout(user_id, curr_time, 
-                                                                     workout, llm_prompt, response, workout_doc, "generated", None)
-               if success:
-                    workout_id = workout_result["_id"]
-                    return jsonify({"message": "Workout created successfully", "user_id": user_id, "workout_id": str(workout_id), "workout_details": workout_doc}), 201
-               else:
-                    return jsonify({"Server-side error": "Failed when creating workout"}), 500
-               
-          except json.JSONDecodeError as e:
-               return jsonify({"LLM error": str(e)}), 500
-          except Exception as e:
-               logger.critical(f"Critical error {e} occurred when creating workout")
-               return jsonify({"Server-side error": str(e)}), 500
-               
+          workout_doc, error = parse_workout_response(response)
+          if error:
+               return jsonify({"LLM Parsing Error": error}), 500
+
+          workout_result, success = workout_services.create_workout(user_id, curr_time,
+                                                                workout, llm_prompt, response, workout_doc, "generated", None, model)
+          if success:
+               workout_id = workout_result["_id"]
+               return jsonify({"message": "Workout created successfully", "user_id": user_id, "workout_id": str(workout_id), "workout_details": workout_doc}), 201
+          else:
+               return jsonify({"Server-side error": "Failed when creating workout"}), 500
 
-          
       return render_template("index.html")
 
 @routes_bp.route("/users/<user_id>", methods=["GET"])
@@ -235,34 +200,85 @@ def create_new_metric():
     else:
         return jsonify({"Server-side error": "Failed to record new metric."}), 500
 
+@routes_bp.route("/metrics/bulk", methods=["POST"])
+def create_metrics_bulk():
+    # Accepts a JSON array (or {"readings": [...]}) or NDJSON, one reading per line.
+    if request.mimetype in ("application/x-ndjson", "application/jsonl"):
+        readings = []
+        for line in request.get_data(as_text=True).splitlines():
+            if not line.strip():
+                continue
+            try:
+                readings.append(json.loads(line))
+            except json.JSONDecodeError:
+                readings.append(None)
+    else:
+        data = request.get_json(silent=True)
+        readings = data.get("readings") if isinstance(data, dict) else data
+    if not isinstance(readings, list) or not readings:
+        return jsonify({"Client-side error": "A non-empty list of readings is required."}), 400
+    if len(readings) > metric_services.MAX_BULK_METRICS:
+        return jsonify({"Client-side error": f"At most {metric_services.MAX_BULK_METRICS} readings per request."}), 400
+
+    results, success = metric_services.create_metrics_bulk(readings)
+    if not success:
+        return jsonify({"Server-side error": "Failed to record metrics; nothing was written."}), 500
+    inserted = sum(r["status"] == "inserted" for r in results)
+    return jsonify({
+        "results": results,
+        "inserted": inserted,
+        "skipped": len(results) - inserted
+    }), 200
+
+@routes_bp.route("/metrics/latest/<user_id>", methods=["GET"])
+def get_latest_metrics(user_id):
+    result, success = metric_services.read_latest_metrics(user_id)
+    if result and success:
+        return jsonify({"User Info": result}), 200
+    else:
+        return jsonify({"Database error": "Latest metrics not found for user."}), 404
+
 @routes_bp.route("/metrics/height/latest/<user_id>", methods=["GET"])
 def get_latest_height(user_id):
-    result, success = metric_services.read_latest_height(user_id)
+    result, success = metric_services.read_latest_metrics(user_id)
     if result and success:
-        if "_id" in result:
-            result["metric_id"] = str(result["metric_id"])
-        if "recorded_at" in result and isinstance(result["recorded_at"], datetime):
-            result["recorded_at"] = result["recorded_at"].isoformat()
-        if "user_id" in result and isinstance(result["user_id"], uuid.UUID):
-            result["user_id"] = str(result["user_id"])
         return jsonify({"User Info": result}), 200
     else:
         return jsonify({"Database error": "Latest height not found for user."}), 404
 
 @routes_bp.route("/metrics/weight/latest/<user_id>", methods=["GET"])
 def get_latest_weight(user_id):
-    result, success = metric_services.read_latest_weight(user_id)
+    result, success = metric_services.read_latest_metrics(user_id)
     if result and success:
-        if "metric_id" in result:
-            result["metric_id"] = str(result["metric_id"])
-        if "recorded_at" in result and isinstance(result["recorded_at"], datetime):
-            result["recorded_at"] = result["recorded_at"].isoformat()
-        if "user_id" in result and isinstance(result["user_id"], uuid.UUID):
-            result["user_id"] = str(result["user_id"])
         return jsonify({"User Info": result}), 200
     else:
         return jsonify({"Database error": "Latest weight not found for user."}), 404
 
+@routes_bp.route("/metrics/<user_id>/series", methods=["GET"])
+def get_metric_series(user_id):
+    try:
+        start = request.args.get("start")
+        end = request.args.get("end")
+        start = datetime.fromisoformat(start) if start else None
+        end = datetime.fromisoformat(end) if end else None
+        bucket = request.args.get("bucket", "day")
+        fields = [f.strip() for f in request.args.get("fields", "weight").split(",") if f.strip()]
+        aggregations = [a.strip() for a in request.args.get("agg", "avg").split(",") if a.strip()]
+        metric_services.validate_series_params(bucket, fields, aggregations)
+    except ValueError as e:
+        return jsonify({"Client-side error": f"Invalid series parameters: {e}"}), 400
+
+    result, success = metric_services.read_metric_series(user_id, start, end, bucket, fields, aggregations)
+    if not success:
+        return jsonify({"Server-side error": "Failed to read metric series."}), 500
+    return jsonify({
+        "user_id": user_id,
+        "bucket_size": bucket,
+        "start": start.isoformat() if start else None,
+        "end": end.isoformat() if end else None,
+        "series": result
+    }), 200
+
 @routes_bp.route("/metrics/height/<user_id>", methods=["PUT"])
 def update_user_height(user_id):
     try:
@@ -315,77 +331,83 @@ def delete_all_user_metrics(user_id):
     else:
         return jsonify({"Server-side error": "Failed to delete user metrics."}), 500
 
+def _read_generation_request(data, user_id):
+    height = data.get("height")
+    weight = data.get("weight")
+    plan = data.get("plan")
+    workout_target = data.get("workout")
+    activity = data.get("activity")
+
+    if not all([user_id, height, weight, plan, workout_target, activity]):
+        raise KeyError("Missing required fields for workout generation.")
+    if plan not in ["Dirty Bulk", "Lean Bulk", "Standard Cut", "Aggressive Cut", "Body Recomposition","Maintain"]:
+         raise ValueError("Invalid plan type.")
+    if activity not in ["Sedentary", "Lightly Active", "Active", "Extremely Active"]:
+         raise ValueError("Invalid activity level.")
+    return height, weight, plan, workout_target, activity
+
 @routes_bp.route("/workouts/generate/<user_id>", methods=["POST"])
 def generate_and_store_workout_for_user(user_id):
     try:
         data = request.json
-        height = data.get("height")
-        weight = data.get("weight")
-        plan = data.get("plan")
-        workout_target = data.get("workout")
-        activity = data.get("activity")
-
-        if not all([user_id, height, weight, plan, workout_target, activity]):
-            return jsonify({"Client-side error": "Missing required fields for workout generation."}), 400
-        if plan not in ["Dirty Bulk", "Lean Bulk", "Standard Cut", "Aggressive Cut", "Body Recomposition","Maintain"]:
-             raise ValueError("Invalid plan type.")
-        if activity not in ["Sedentary", "Lightly Active", "Active", "Extremely Active"]:
-             raise ValueError("Invalid activity level.")
-
-    except (ValueError, TypeError) as e:
+        height, weight, plan, workout_target, activity = _read_generation_request(data, user_id)
+    except KeyError as e:
+        return jsonify({"Client-side error": e.args[0]}), 400
+    except (ValueError, TypeError, AttributeError) as e:
         return jsonify({"Client-side error": f"Invalid data types or values: {e}"}), 400
     except json.JSONDecodeError as e:
         return jsonify({"Client-side error": f"Invalid JSON data: {e}"}), 400
 
     curr_time = datetime.now()
 
-    response, llm_prompt = generate_workout_llm_output(height, weight, plan, workout_target, activity)
+    use_cache = not (cache_bypass_requested(request) or data.get("no_cache"))
+    try:
+        response, llm_prompt, model = generation_service.run(
+            generate_workout_llm_output_async, height, weight, plan, workout_target, activity,
+            user_id=user_id, use_cache=use_cache
+        )
+    except UserConcurrencyLimitError as e:
+        return jsonify({"Client-side error": str(e)}), 429
     if response is None:
         return jsonify({"Server-side error": "Failed to generate workout from AI."}), 500
     
-    try:
-        workout_dict = json.loads(response)
-        if "error" in workout_dict:
-            error_message = workout_dict["error"].get("message", "Unknown LLM API error")
-            return jsonify({"LLM API Error": error_message}), 500
-        
-        workout_doc = []
-        for k, v in workout_dict.items():
-            to_enter = {
-                "Exercise": k,
-                "Sets": 0,
-                "Rep Range": [0, 0]
-            }
-            if isinstance(v, list) and len(v) == 3:
-                try:
-                    sets = int(v[0])
-                    rep_min = int(v[1])
-                    rep_max = int(v[2])
-                    to_enter["Sets"] = sets
-                    to_enter["Rep Range"] = [rep_min, rep_max]
-                except ValueError as ve:
-                    logger.error(f"LLM output values not convertible to int for exercise {k}: {v}. Error: {ve}", exc_info=True)
-                    return jsonify({"LLM Parsing Error": "AI did not return numeric values for sets/reps."}), 500
-            else:
-                logger.error(f"LLM returned unintended format for exercise {k}: {v}. Expected list of 3.", exc_info=True)
-                return jsonify({"LLM Parsing Error": "Failed to parse exercises from AI output."}), 500
-            workout_doc.append(to_enter)
-
-        workout_result, success = workout_services.create_workout(
-            user_id, curr_time, workout_target, llm_prompt, response, workout_doc, "generated", None
-        )
-        if success:
-            workout_id = workout_result["_id"]
-            return jsonify({"message": "Workout generated and stored successfully", "workout_id": str(workout_id), "workout_details": workout_doc}), 201
-        else:
-            return jsonify({"Server-side error": "Failed to store generated workout."}), 500
+    workout_doc, error = parse_workout_response(response)
+    if error:
+        return jsonify({"LLM Parsing Error": error}), 500
 
+    workout_result, success = workout_services.create_workout(
+        user_id, curr_time, workout_target, llm_prompt, response, workout_doc, "generated", None, model
+    )
+    if success:
+        workout_id = workout_result["_id"]
+        return jsonify({"message": "Workout generated and stored successfully", "workout_id": str(workout_id), "workout_details": workout_doc}), 201
+    else:
+        return jsonify({"Server-side error": "Failed to store generated workout."}), 500
+
+@routes_bp.route("/workouts/generate/<user_id>/jobs", methods=["POST"])
+def submit_workout_generation_job(user_id):
+    try:
+        data = request.json
+        height, weight, plan, workout_target, activity = _read_generation_request(data, user_id)
+    except KeyError as e:
+        return jsonify({"Client-side error": e.args[0]}), 400
+    except (ValueError, TypeError, AttributeError) as e:
+        return jsonify({"Client-side error": f"Invalid data types or values: {e}"}), 400
     except json.JSONDecodeError as e:
-        logger.error(f"JSONDecodeError parsing LLM response: {e}", exc_info=True)
-        return jsonify({"LLM Parsing Error": "AI response was not valid JSON."}), 500
-    except Exception as e:
-        logger.critical(f"Critical error during workout generation/storage: {e}", exc_info=True)
-        return jsonify({"Server-side error": "An unexpected error occurred during workout processing."}), 500
+        return jsonify({"Client-side error": f"Invalid JSON data: {e}"}), 400
+
+    payload = {
+        "user_id": user_id,
+        "height": height,
+        "weight": weight,
+        "plan": plan,
+        "workout": workout_target,
+        "activity": activity,
+        "use_cache": not (cache_bypass_requested(request) or data.get("no_cache")),
+    }
+    idempotency_key = request.headers.get("Idempotency-Key") or data.get("idempotency_key")
+    job, created = job_queue.submit("direct", payload, idempotency_key)
+    return jsonify(job), 202 if created else 200
 
 @routes_bp.route("/workouts/latest/<user_id>", methods=["GET"])
 def get_latest_workout(user_id):
@@ -397,11 +419,25 @@ def get_latest_workout(user_id):
 
 @routes_bp.route("/workouts/user/<user_id>", methods=["GET"])
 def get_all_workouts_for_user(user_id):
-    result, success = workout_services.read_workouts_for_user(user_id)
-    if result and success:
-        return jsonify(result), 200
-    else:
+    cursor = request.args.get("cursor")
+    try:
+        limit = int(request.args.get("limit", 20))
+        if limit < 1:
+            raise ValueError("limit must be positive.")
+        fields = request.args.get("fields")
+        if fields:
+            fields = [f.strip() for f in fields.split(",") if f.strip()]
+        else:
+            fields = workout_services.LIST_FIELDS
+        result, success = workout_services.read_workouts_page(user_id, limit, cursor, fields)
+    except ValueError as e:
+        return jsonify({"Client-side error": f"Invalid pagination parameters: {e}"}), 400
+
+    if not success:
+        return jsonify({"Server-side error": "Failed to read workouts for user."}), 500
+    if not result["workouts"] and not cursor:
         return jsonify({"Database error": "No workouts found for user."}), 404
+    return jsonify(result), 200
 
 @routes_bp.route("/workouts/<workout_id>", methods=["GET"])
 def get_workout_by_id(workout_id):
@@ -1,31 +1,109 @@
-from pymongo import MongoClient
-from groq import Groq
-import os 
+import os
+import sys
+import threading
+from dataclasses import dataclass
 from dotenv import load_dotenv
-import psycopg2
 from psycopg2 import Error as Psycopg2Error
 from services.helper import logger
+from configs.db_pool import ConnectionPool
+from services.instrumentation import observe_db_call
 
+# Only reads a local file; services read their tuning knobs from the
+# environment when they are imported, so this has to happen first.
 load_dotenv()
 
-mongo_uri = os.getenv("MONGO_URI")
-if not mongo_uri:
-      raise ValueError("Mongo connection string not properly initialized, please try again")
 
-mongo_client = MongoClient(mongo_uri)
+@dataclass(frozen=True)
+class Settings:
+    groq_api: str
+    database_url: str
+    db_pool_min_size: int
+    db_pool_max_size: int
+    db_pool_timeout: float
+    db_pool_max_idle: float
+    db_pool_health_check_after: float
 
-groq_api = os.getenv("GROK_API")
-if not groq_api:
-      raise ValueError("Grok API key not properly initialized, please try again")
+    @classmethod
+    def from_env(cls):
+        return cls(
+            groq_api=os.getenv("GROK_API"),
+            database_url=os.getenv("DATABASE_URL"),
+            db_pool_min_size=int(os.getenv("DB_POOL_MIN_SIZE", "1")),
+            db_pool_max_size=int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+            db_pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "10")),
+            db_pool_max_idle=float(os.getenv("DB_POOL_MAX_IDLE", "300")),
+            db_pool_health_check_after=float(os.getenv("DB_POOL_HEALTH_CHECK_AFTER", "30")),
+        )
 
-groq_client = Groq(api_key=groq_api)
 
-PG_URI = os.getenv("DATABASE_URL")
+_settings = None
+_groq_client = None
+_db_pool = None
+_init_lock = threading.RLock()
+
+def get_settings():
+    global _settings
+    if _settings is None:
+        with _init_lock:
+            if _settings is None:
+                _settings = Settings.from_env()
+    return _settings
+
+def get_groq_api_key():
+    groq_api = get_settings().groq_api
+    if not groq_api:
+        raise ValueError("Grok API key not properly initialized, please try again")
+    return groq_api
+
+def get_groq_client():
+    # The groq SDK is slow to import and only the generation paths need it.
+    global _groq_client
+    if _groq_client is None:
+        with _init_lock:
+            if _groq_client is None:
+                from groq import Groq
+                # Retries are handled by services.llm_resilience, not the SDK.
+                _groq_client = Groq(api_key=get_groq_api_key(), max_retries=0)
+    return _groq_client
+
+def get_db_pool():
+    global _db_pool
+    if _db_pool is None:
+        settings = get_settings()
+        with _init_lock:
+            if _db_pool is None:
+                _db_pool = ConnectionPool(
+                    settings.database_url,
+                    min_size=settings.db_pool_min_size,
+                    max_size=settings.db_pool_max_size,
+                    timeout=settings.db_pool_timeout,
+                    max_idle=settings.db_pool_max_idle,
+                    health_check_after=settings.db_pool_health_check_after,
+                    on_release=observe_db_call,
+                )
+    return _db_pool
+
 def get_db_connection():
-    conn = None
     try:
-        conn = psycopg2.connect(PG_URI)
-        return conn
+        # Timings are labelled with the calling service function.
+        return get_db_pool().connection(label=sys._getframe(1).f_code.co_name)
     except Psycopg2Error as e:
         logger.error(f"PostgreSQL connection error: {e}", exc_info=True)
-        raise ConnectionError(f"Failed to connect to PostgreSQL: {e}") from e
\ No newline at end of file
+        raise ConnectionError(f"Failed to connect to PostgreSQL: {e}") from e
+
+# Old module-level names, resolved on first access instead of at import.
+_LAZY_ATTRIBUTES = {
+    "groq_client": get_groq_client,
+    "groq_api": get_groq_api_key,
+    "PG_URI": lambda: get_settings().database_url,
+    "DB_POOL_MIN_SIZE": lambda: get_settings().db_pool_min_size,
+    "DB_POOL_MAX_SIZE": lambda: get_settings().db_pool_max_size,
+    "DB_POOL_TIMEOUT": lambda: get_settings().db_pool_timeout,
+    "DB_POOL_MAX_IDLE": lambda: get_settings().db_pool_max_idle,
+    "DB_POOL_HEALTH_CHECK_AFTER": lambda: get_settings().db_pool_health_check_after,
+}
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,209 @@
+import threading
+import time
+from collections import deque
+import psycopg2
+from psycopg2 import Error as Psycopg2Error
+from psycopg2 import extensions
+
+
+class PoolTimeoutError(ConnectionError):
+    pass
+
+
+class PooledConnection:
+    """Proxy handed out by the pool.
+
+    Behaves like a psycopg2 connection, but leaving the ``with`` block (or
+    calling ``close()``) hands the underlying connection back to the pool
+    instead of leaking it.
+    """
+
+    def __init__(self, pool, conn, label=None):
+        self._pool = pool
+        self._conn = conn
+        self._label = label
+        self._checked_out_at = time.perf_counter()
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise Psycopg2Error("connection already returned to the pool")
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if self._conn is not None and not self._conn.closed:
+                if exc_type is None:
+                    self._conn.commit()
+                else:
+                    self._conn.rollback()
+        finally:
+            self.close()
+        return False
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.release(conn)
+            if self._pool.on_release is not None and self._label is not None:
+                self._pool.on_release(self._label, time.perf_counter() - self._checked_out_at)
+
+    def __del__(self):
+        # Safety net for call sites that forget to close.
+        if getattr(self, "_conn", None) is not None:
+            try:
+                self.close()
+            except Exception:
+                pass
+
+
+class ConnectionPool:
+    def __init__(self, dsn, min_size=1, max_size=10, timeout=10.0,
+                 max_idle=300.0, health_check_after=30.0, on_release=None):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Invalid pool size configuration")
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.health_check_after = health_check_after
+        # Called with (label, seconds held) when a labelled connection is returned.
+        self.on_release = on_release
+
+        self._idle = deque()  # (conn, last_used)
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition(threading.Lock())
+
+        self._stats = {
+            "connections_created": 0,
+            "connections_closed": 0,
+            "checkouts": 0,
+            "checkout_timeouts": 0,
+            "health_check_failures": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+
+        for _ in range(min_size):
+            self._idle.append((self._connect(), time.monotonic()))
+
+    def _connect(self):
+        # Caller must not hold the lock; connecting is network I/O.
+        conn = psycopg2.connect(self.dsn)
+        with self._cond:
+            self._stats["connections_created"] += 1
+        return conn
+
+    def _discard(self, conn):
+        # Caller holds the lock.
+        self._stats["connections_closed"] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except Psycopg2Error:
+            with self._cond:
+                self._stats["health_check_failures"] += 1
+            return False
+
+    def _reap_idle(self):
+        # Caller holds the lock. Idle deque is ordered oldest-first.
+        now = time.monotonic()
+        while len(self._idle) + self._in_use > self.min_size and self._idle:
+            conn, last_used = self._idle[0]
+            if now - last_used < self.max_idle:
+                break
+            self._idle.popleft()
+            self._discard(conn)
+
+    def getconn(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeoutError("Connection pool is closed")
+                self._reap_idle()
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._in_use < self.max_size:
+                    conn, last_used = None, None
+                    self._in_use += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["checkout_timeouts"] += 1
+                    raise PoolTimeoutError(f"Timed out after {self.timeout}s waiting for a database connection")
+                self._cond.wait(remaining)
+
+            waited = time.monotonic() - start
+            self._stats["checkouts"] += 1
+            self._stats["wait_seconds_total"] += waited
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+
+        # Network I/O happens outside the lock so other threads are not blocked on it.
+        try:
+            if conn is not None and not self._is_healthy(conn, last_used):
+                with self._cond:
+                    self._discard(conn)
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def release(self, conn):
+        reusable = not conn.closed
+        if reusable and conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Psycopg2Error:
+                reusable = False
+        with self._cond:
+            self._in_use -= 1
+            if reusable and not self._closed:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._discard(conn)
+            self._cond.notify()
+
+    def connection(self, label=None):
+        return PooledConnection(self, self.getconn(), label)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.popleft()
+                self._discard(conn)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats["in_use"] = self._in_use
+            stats["idle"] = len(self._idle)
+            stats["min_size"] = self.min_size
+            stats["max_size"] = self.max_size
+        return stats
@@ -0,0 +1,76 @@
+import argparse
+import statistics
+import time
+from configs.config import get_db_connection
+from services.context_services import load_generation_context
+
+# The queries generate_workout_with_rag ran before the single-query context
+# loader, inlined so the baseline does not pick up the metrics and exercise
+# caches the current readers go through.
+LEGACY_USER_SQL = "SELECT user_id, username, password_hash, created_at, updated_at, activity_level, plan FROM users WHERE user_id = %s;"
+LEGACY_LATEST_METRIC_SQL = """
+SELECT metric_id, user_id, height, weight, recorded_at
+FROM metrics WHERE user_id = %s
+ORDER BY recorded_at DESC LIMIT 1;
+"""
+LEGACY_WORKOUTS_SQL = """
+SELECT workout_id, user_id, muscles_targeted, llm_prompt, llm_raw,
+       parsed_workout, date_generated, status, completed_on
+FROM workouts WHERE user_id = %s
+ORDER BY date_generated DESC;
+"""
+LEGACY_EXERCISES_SQL = """
+SELECT exercise_id, exercise_name, primary_muscle_group, secondary_muscle_group,
+       equipment, difficulty, instructions, video_url,
+       custom, user_id, created_at
+FROM exercises
+WHERE %s = ANY(primary_muscle_group) OR %s = ANY(secondary_muscle_group);
+"""
+
+
+def _fetch(query, params):
+    # One pooled connection per query, as each legacy reader did.
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(query, params)
+            return cur.fetchall()
+
+
+def legacy_context(user_id, workout_targets):
+    # The serial 3 + N round-trip path.
+    _fetch(LEGACY_USER_SQL, (user_id,))
+    _fetch(LEGACY_LATEST_METRIC_SQL, (user_id,))
+    _fetch(LEGACY_WORKOUTS_SQL, (user_id,))
+    for muscle in workout_targets:
+        _fetch(LEGACY_EXERCISES_SQL, (muscle, muscle))
+
+
+def single_query_context(user_id, workout_targets):
+    load_generation_context(user_id, workout_targets)
+
+
+def measure(fn, user_id, workout_targets, iterations):
+    fn(user_id, workout_targets)  # warm the pool
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn(user_id, workout_targets)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare p50 pre-LLM latency of the RAG context paths.")
+    parser.add_argument("user_id")
+    parser.add_argument("targets", nargs="+", help="muscle groups to target")
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    before = measure(legacy_context, args.user_id, args.targets, args.iterations)
+    after = measure(single_query_context, args.user_id, args.targets, args.iterations)
+    print(f"pre-LLM p50 before (serial queries): {before:.2f} ms")
+    print(f"pre-LLM p50 after (single round trip): {after:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
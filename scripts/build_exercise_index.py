@@ -0,0 +1,25 @@
+import argparse
+import sys
+import time
+from services.exercise_catalog import catalog
+from services.exercise_index import EXERCISE_INDEX_PATH, ExerciseIndex
+
+
+def build(path=EXERCISE_INDEX_PATH):
+    start = time.perf_counter()
+    exercises = list(catalog.library().values())
+    index = ExerciseIndex.build(exercises)
+    index.save(path)
+    return len(exercises), len(index.vocabulary), time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the exercise retrieval index from the exercise library.")
+    parser.add_argument("--output", default=EXERCISE_INDEX_PATH, help=f"index file to write (default {EXERCISE_INDEX_PATH})")
+    args = parser.parse_args()
+    try:
+        exercises, terms, elapsed = build(args.output)
+    except Exception as e:
+        print(f"Building the exercise index failed: {e}")
+        sys.exit(1)
+    print(f"Indexed {exercises} exercises ({terms} terms) into {args.output} in {elapsed:.2f}s")
@@ -0,0 +1,70 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# module -> modules it must not pull in at import time
+CHECKS = {
+    "configs.config": ("groq", "httpx", "pymongo"),
+    "scripts.db_init": ("groq", "httpx", "pymongo", "flask"),
+    "scripts.exercise_init": ("groq", "httpx", "pymongo", "flask"),
+    "services.job_services": ("groq", "httpx", "pymongo"),
+}
+
+PROBE = """
+import json, socket, sys, time
+opened = []
+_connect = socket.socket.connect
+def _record(self, address):
+    opened.append(str(address))
+    return _connect(self, address)
+socket.socket.connect = _record
+start = time.perf_counter()
+__import__(sys.argv[1])
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "modules": sorted(sys.modules), "sockets": opened}))
+"""
+
+
+def probe(module, root):
+    # A fresh interpreter per module so earlier imports do not hide the cost.
+    env = dict(os.environ, PYTHONPATH=root + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    result = subprocess.run([sys.executable, "-c", PROBE, module], capture_output=True, text=True, env=env, cwd=root)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if importing entry-point modules is slow, opens sockets or loads heavy clients.")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "300")),
+                        help="maximum import time per module in milliseconds (default 300)")
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    failed = False
+    for module, forbidden in CHECKS.items():
+        try:
+            report = probe(module, root)
+        except RuntimeError as e:
+            print(f"[FAIL] {module}: {e}")
+            failed = True
+            continue
+        elapsed_ms = report["seconds"] * 1000
+        loaded = [name for name in forbidden if name in report["modules"]]
+        problems = []
+        if elapsed_ms > args.budget_ms:
+            problems.append(f"took {elapsed_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+        if loaded:
+            problems.append(f"imported {', '.join(loaded)}")
+        if report["sockets"]:
+            problems.append(f"opened sockets to {', '.join(report['sockets'])}")
+        failed = failed or bool(problems)
+        print(f"[{'FAIL' if problems else 'OK'}] {module}: {elapsed_ms:.0f} ms" + (f" - {'; '.join(problems)}" if problems else ""))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,89 @@
 from configs.config import get_db_connection
+import argparse
 import logging
+import sys
 from psycopg2 import Error as Psycopg2Error
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Append-only: each entry is (version, description, statements). Applied
+# versions are recorded in schema_version and never re-run.
+MIGRATIONS = [
+    (1, "Indexes for per-user time-ordered reads and muscle-group array lookups", [
+        "CREATE INDEX IF NOT EXISTS idx_metrics_user_recorded_at ON metrics (user_id, recorded_at DESC);",
+        "CREATE INDEX IF NOT EXISTS idx_workouts_user_date_generated ON workouts (user_id, date_generated DESC, workout_id DESC);",
+        "CREATE INDEX IF NOT EXISTS idx_exercises_primary_muscle_group ON exercises USING GIN (primary_muscle_group);",
+        "CREATE INDEX IF NOT EXISTS idx_exercises_secondary_muscle_group ON exercises USING GIN (secondary_muscle_group);",
+    ]),
+    (2, "Content hashes for incremental exercise sync and soft-deleted exercises", [
+        """
+        CREATE TABLE IF NOT EXISTS exercise_sources (
+            source_path TEXT PRIMARY KEY,
+            exercise_name VARCHAR(255) NOT NULL,
+            content_hash CHAR(64) NOT NULL,
+            synced_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        );
+        """,
+        "ALTER TABLE exercises ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP WITH TIME ZONE;",
+    ]),
+    (3, "Model that produced each generated workout", [
+        "ALTER TABLE workouts ADD COLUMN IF NOT EXISTS model VARCHAR(100);",
+    ]),
+    (4, "One metrics row per user and timestamp", [
+        # Existing collisions are user data, so they are reported for manual
+        # cleanup rather than deleted; the migration stops until none remain.
+        """
+        DO $$
+        DECLARE conflicts TEXT;
+        BEGIN
+            SELECT string_agg(format('user %s at %s: %s rows', user_id, recorded_at, n), E'\n')
+            INTO conflicts
+            FROM (
+                SELECT user_id, recorded_at, count(*) AS n FROM metrics
+                GROUP BY user_id, recorded_at HAVING count(*) > 1
+                ORDER BY user_id, recorded_at LIMIT 100
+            ) duplicates;
+            IF conflicts IS NOT NULL THEN
+                RAISE EXCEPTION 'metrics has rows sharing (user_id, recorded_at); merge or delete them and rerun (first 100):%', E'\n' || conflicts;
+            END IF;
+        END $$;
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_metrics_user_recorded_at ON metrics (user_id, recorded_at);",
+    ]),
+]
+
+# (description, query, params, indexes the plan is expected to use)
+HOT_QUERIES = [
+    (
+        "latest metric for user",
+        "SELECT metric_id, user_id, height, weight, recorded_at FROM metrics WHERE user_id = %s ORDER BY recorded_at DESC LIMIT 1;",
+        ("00000000-0000-0000-0000-000000000000",),
+        {"idx_metrics_user_recorded_at"},
+    ),
+    (
+        "workout history page for user",
+        "SELECT workout_id, date_generated, muscles_targeted FROM workouts WHERE user_id = %s ORDER BY date_generated DESC, workout_id DESC LIMIT 21;",
+        ("00000000-0000-0000-0000-000000000000",),
+        {"idx_workouts_user_date_generated"},
+    ),
+    (
+        "exercises by muscle group",
+        "SELECT exercise_id, exercise_name FROM exercises WHERE primary_muscle_group @> ARRAY[%s]::varchar[] OR secondary_muscle_group @> ARRAY[%s]::varchar[];",
+        ("chest", "chest"),
+        {"idx_exercises_primary_muscle_group", "idx_exercises_secondary_muscle_group"},
+    ),
+    (
+        "exercises for several target muscles",
+        "SELECT exercise_name FROM exercises WHERE primary_muscle_group && %s::varchar[] OR secondary_muscle_group && %s::varchar[];",
+        (["chest", "triceps"], ["chest", "triceps"]),
+        {"idx_exercises_primary_muscle_group", "idx_exercises_secondary_muscle_group"},
+    ),
+]
+
 def create_tables():
     conn = None
+    cur = None
     try:
         conn = get_db_connection()
         cur = conn.cursor()
@@ -102,9 +179,83 @@ def create_tables():
         if conn:
             conn.close()
 
+def run_migrations():
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+            );
+            """)
+            conn.commit()
+
+        applied = []
+        for version, description, statements in MIGRATIONS:
+            with conn.cursor() as cur:
+                # Serialize concurrent runners; the lock is released at commit.
+                cur.execute("SELECT pg_advisory_xact_lock(hashtext('schema_version'));")
+                cur.execute("SELECT 1 FROM schema_version WHERE version = %s;", (version,))
+                if cur.fetchone():
+                    conn.rollback()
+                    continue
+                logger.info(f"Applying migration {version}: {description}")
+                for statement in statements:
+                    cur.execute(statement)
+                cur.execute("INSERT INTO schema_version (version, description) VALUES (%s, %s);", (version, description))
+                conn.commit()
+                applied.append(version)
+        logger.info(f"Schema up to date (applied {len(applied)} migration(s)).")
+        return applied
+    except Psycopg2Error as e:
+        logger.error(f"Database error during migration: {e}", exc_info=True)
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def _plan_indexes(plan):
+    found = set()
+    if "Index Name" in plan:
+        found.add(plan["Index Name"])
+    for child in plan.get("Plans", []):
+        found |= _plan_indexes(child)
+    return found
+
+# Sequential scans are disabled for the check: on a small or freshly seeded
+# table the planner rightly prefers a seq scan, which says nothing about
+# whether the index is usable once the table grows.
+def check_indexes():
+    conn = get_db_connection()
+    all_ok = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL enable_seqscan = off;")
+            for description, query, params, expected in HOT_QUERIES:
+                cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+                plan = cur.fetchone()[0][0]["Plan"]
+                used = _plan_indexes(plan)
+                ok = bool(used & expected)
+                all_ok = all_ok and ok
+                status = "OK" if ok else "MISSING INDEX"
+                logger.info(f"[{status}] {description}: uses {sorted(used) or 'no index'} (expected one of {sorted(expected)})")
+        conn.rollback()
+    finally:
+        conn.close()
+    return all_ok
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create tables and apply schema migrations.")
+    parser.add_argument("--check-indexes", action="store_true", help="EXPLAIN hot queries and verify they use an index")
+    args = parser.parse_args()
     try:
         create_tables()
+        run_migrations()
         logger.info("Database initialization complete.")
+        if args.check_indexes and not check_indexes():
+            sys.exit(1)
     except Exception as e:
-        logger.error(f"Failed to initialize database: {e}")
\ No newline at end of file
+        logger.error(f"Failed to initialize database: {e}")
+        sys.exit(1)
\ No newline at end of file
@@ -1,14 +1,54 @@
+import argparse
 import glob
+import hashlib
 import json
 import datetime
 import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from psycopg2 import Error as Psycopg2Error
+from psycopg2.extras import execute_values
+from configs.config import get_db_connection
 from services.exercise_services import create_exercise
+from services.exercise_catalog import catalog
 from services.helper import logger
 
+EXERCISE_COLUMNS = (
+    "exercise_name", "primary_muscle_group", "secondary_muscle_group",
+    "equipment", "difficulty", "instructions", "video_url",
+    "custom", "user_id", "created_at",
+)
 
-def load_db(json_data, file_name):
+# Library rows only; custom exercises share the unique name constraint but are
+# never touched by the loader.
+UPSERT_SQL = f"""
+INSERT INTO exercises ({", ".join(EXERCISE_COLUMNS)})
+VALUES %s
+ON CONFLICT (exercise_name) DO UPDATE SET
+    primary_muscle_group = EXCLUDED.primary_muscle_group,
+    secondary_muscle_group = EXCLUDED.secondary_muscle_group,
+    equipment = EXCLUDED.equipment,
+    difficulty = EXCLUDED.difficulty,
+    instructions = EXCLUDED.instructions,
+    video_url = EXCLUDED.video_url,
+    deleted_at = NULL
+WHERE exercises.custom = FALSE;
+"""
+
+SOURCES_UPSERT_SQL = """
+INSERT INTO exercise_sources (source_path, exercise_name, content_hash)
+VALUES %s
+ON CONFLICT (source_path) DO UPDATE SET
+    exercise_name = EXCLUDED.exercise_name,
+    content_hash = EXCLUDED.content_hash,
+    synced_at = CURRENT_TIMESTAMP;
+"""
+
+
+def transform(json_data, file_name):
     exercise_name = json_data.get("name", f"null_name_from_{os.path.basename(file_name)}")
-    
+
     def extract_muscle_names(muscles_raw):
         extracted_names = []
         if isinstance(muscles_raw, list):
@@ -35,44 +75,154 @@ def load_db(json_data, file_name):
     elif isinstance(instructions_raw, str):
         instructions_transformed = instructions_raw
 
-    video_url = json_data.get("videoURL", None) 
-    
+    video_url = json_data.get("videoURL", None)
+
     is_custom = False
     created_by_user_id = None
-    
+
     created_at = datetime.datetime.now()
 
-    result, success = create_exercise(
+    return (
         exercise_name,
         primary_muscles_transformed,
         secondary_muscles_transformed,
         equipment,
         difficulty,
         instructions_transformed,
-        video_url, 
+        video_url,
         is_custom,
         created_by_user_id,
         created_at
     )
-    
-    if not success:
-        logger.error(f"Error creating exercise '{exercise_name}' from file {os.path.basename(file_name)}")
-
-folder_path = '/Users/ayan/Desktop/projs/free-exercise-db/exercises'
 
-json_files_pattern = os.path.join(folder_path, '*.json')
+def load_db(json_data, file_name):
+    # Single-exercise path, kept for ad-hoc loads; bulk_load is the fast path.
+    row = transform(json_data, file_name)
+    result, success = create_exercise(*row)
 
-json_file_paths = glob.glob(json_files_pattern)
+    if not success:
+        logger.error(f"Error creating exercise '{row[0]}' from file {os.path.basename(file_name)}")
 
-for file_path in json_file_paths:
+def parse_file(file_path):
+    # Runs in a worker process; returns (row, error) so one bad file does not
+    # abort the pool.
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            load_db(data, file_path)
+            return transform(json.load(f), file_path), None
     except json.JSONDecodeError as e:
-        print(f"Error decoding JSON from {file_path}: {e}")
+        return None, f"Error decoding JSON from {file_path}: {e}"
     except FileNotFoundError:
-        print(f"File not found: {file_path}")
+        return None, f"File not found: {file_path}"
     except Exception as e:
-        print(f"An unexpected error occurred with {file_path}: {e}")
-        
+        return None, f"An unexpected error occurred with {file_path}: {e}"
+
+def hash_file(file_path):
+    with open(file_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _read_sources(cur):
+    cur.execute("SELECT source_path, exercise_name, content_hash FROM exercise_sources;")
+    return {path: (name, content_hash) for path, name, content_hash in cur.fetchall()}
+
+def _names_to_prune(known, hashes, renamed_from):
+    # Names whose source file is gone (or now defines a different exercise),
+    # unless some remaining file still defines that name.
+    kept = {name for path, (name, _) in known.items() if path in hashes and path not in renamed_from}
+    candidates = {name for path, (name, _) in known.items() if path not in hashes}
+    candidates |= set(renamed_from.values())
+    return sorted(candidates - kept), sorted(path for path in known if path not in hashes)
+
+def bulk_load(source_dir, batch_size=500, workers=None, sync=False, prune=False):
+    # Full load upserts every file. With sync=True only files whose content
+    # hash differs from the last recorded one are parsed and written; with
+    # prune=True exercises whose source file disappeared are soft-deleted.
+    file_paths = sorted(glob.glob(os.path.join(source_dir, '*.json')))
+    if not file_paths:
+        logger.error(f"No exercise JSON files found in {source_dir}")
+        return 0, False
+
+    start = time.perf_counter()
+    # Keyed by file name so moving the source folder does not look like a change.
+    hashes = {os.path.basename(path): hash_file(path) for path in file_paths}
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                known = _read_sources(cur) if (sync or prune) else {}
+    except Psycopg2Error as e:
+        logger.error(f"Could not read exercise sync state: {e}")
+        return 0, False
+
+    if sync:
+        changed_paths = [path for path in file_paths if known.get(os.path.basename(path), (None, None))[1] != hashes[os.path.basename(path)]]
+    else:
+        changed_paths = file_paths
+
+    rows = {}
+    sources = []
+    failed = 0
+    renamed_from = {}
+    if changed_paths:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = pool.map(parse_file, changed_paths, chunksize=max(1, len(changed_paths) // 64))
+            for path, (row, error) in zip(changed_paths, parsed):
+                if error:
+                    failed += 1
+                    logger.error(error)
+                    continue
+                # A name may only appear once per upsert statement; last file wins.
+                rows[row[0]] = row
+                source_path = os.path.basename(path)
+                sources.append((source_path, row[0], hashes[source_path]))
+                previous = known.get(source_path)
+                if previous and previous[0] != row[0]:
+                    renamed_from[source_path] = previous[0]
+    parsed_at = time.perf_counter()
+
+    pruned_names, pruned_paths = _names_to_prune(known, hashes, renamed_from) if prune else ([], [])
+    pruned_names = [name for name in pruned_names if name not in rows]
+    if not rows and not pruned_names and not pruned_paths:
+        print(f"Exercise library up to date ({len(file_paths)} files checked in {time.perf_counter() - start:.2f}s, {failed} failed)")
+        return 0, True
+
+    deleted = 0
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                # All batches commit together or not at all.
+                if rows:
+                    execute_values(cur, UPSERT_SQL, list(rows.values()), page_size=batch_size)
+                    execute_values(cur, SOURCES_UPSERT_SQL, sources, page_size=batch_size)
+                if pruned_names:
+                    cur.execute(
+                        "UPDATE exercises SET deleted_at = CURRENT_TIMESTAMP "
+                        "WHERE exercise_name = ANY(%s) AND NOT custom AND deleted_at IS NULL;",
+                        (pruned_names,),
+                    )
+                    deleted = cur.rowcount
+                if pruned_paths:
+                    cur.execute("DELETE FROM exercise_sources WHERE source_path = ANY(%s);", (pruned_paths,))
+    except Psycopg2Error as e:
+        logger.error(f"Bulk exercise load failed, nothing was written: {e}")
+        return 0, False
+    catalog.invalidate()
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"Loaded {len(rows)} exercises from {len(changed_paths)} of {len(file_paths)} files ({failed} failed, "
+        f"{deleted} soft-deleted) in {elapsed:.2f}s "
+        f"(parse {parsed_at - start:.2f}s, write {elapsed - (parsed_at - start):.2f}s, "
+        f"{len(rows) / elapsed if elapsed else 0:.0f} rows/sec)"
+    )
+    return len(rows), True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk load the exercise library from a folder of JSON files.")
+    parser.add_argument("source_dir", help="folder containing one exercise JSON file per exercise")
+    parser.add_argument("--batch-size", type=int, default=500, help="rows per INSERT statement (default 500)")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: CPU count)")
+    parser.add_argument("--sync", action="store_true", help="only load files whose content changed since the last run")
+    parser.add_argument("--prune", action="store_true", help="soft-delete exercises whose source file was removed")
+    args = parser.parse_args()
+    loaded, success = bulk_load(args.source_dir, args.batch_size, args.workers, sync=args.sync, prune=args.prune)
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,252 @@
+import asyncio
+import os
+import threading
+import time
+from configs.config import get_groq_api_key
+from services.helper import logger
+from services import model_router
+from services.llm_cache import response_cache
+from services.instrumentation import observe_llm_usage
+from services.llm_processor import (
+    GENERATION_STRATEGIES, DEFAULT_GENERATION_STRATEGY, JSON_MODE,
+    build_workout_prompt, build_rag_prompt, build_refine_prompt, build_single_pass_prompt,
+    workout_cache_key, rag_cache_key, record_generation, completion_content, served_by_primary,
+)
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_MAX_CONCURRENCY_PER_USER = int(os.getenv("LLM_MAX_CONCURRENCY_PER_USER", "2"))
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "32"))
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "60"))
+
+
+class UserConcurrencyLimitError(Exception):
+    pass
+
+
+class AsyncGenerationService:
+    # Generations run as coroutines on one long-lived event loop in a
+    # background thread, so many can be in flight at once over a shared
+    # keep-alive connection pool without a thread per generation. Sync code
+    # (Flask views, job workers) hands work over with submit() or run().
+
+    def __init__(self, max_concurrency=LLM_MAX_CONCURRENCY, max_per_user=LLM_MAX_CONCURRENCY_PER_USER):
+        self.max_concurrency = max_concurrency
+        self.max_per_user = max_per_user
+        self._loop = None
+        self._client = None
+        self._semaphore = None
+        self._user_inflight = {}  # only touched on the loop thread
+        self._background_tasks = set()
+        self._start_lock = threading.Lock()
+        self.stats = {"submitted": 0, "in_flight": 0, "rejected_per_user": 0}
+
+    def _ensure_started(self):
+        if self._loop is not None:
+            return self._loop
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="async-llm-loop", daemon=True)
+                thread.start()
+                asyncio.run_coroutine_threadsafe(self._init_on_loop(), loop).result()
+                self._loop = loop
+        return self._loop
+
+    async def _init_on_loop(self):
+        import httpx
+        from groq import AsyncGroq
+
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        # Retries are handled by services.llm_resilience, not the SDK.
+        self._client = AsyncGroq(
+            api_key=get_groq_api_key(),
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=LLM_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_HTTP_MAX_CONNECTIONS,
+                ),
+                timeout=LLM_REQUEST_TIMEOUT,
+            ),
+        )
+
+    def submit(self, coro_fn, *args, user_id=None, **kwargs):
+        loop = self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(self._guarded(user_id, coro_fn, *args, **kwargs), loop)
+
+    def run(self, coro_fn, *args, user_id=None, timeout=None, **kwargs):
+        return self.submit(coro_fn, *args, user_id=user_id, **kwargs).result(timeout)
+
+    def spawn(self, coro):
+        # Fire-and-forget work on the loop; keeps a reference until it finishes.
+        task = asyncio.get_running_loop().create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
+    async def _guarded(self, user_id, coro_fn, *args, **kwargs):
+        self.stats["submitted"] += 1
+        if user_id is not None:
+            inflight = self._user_inflight.get(user_id, 0)
+            if inflight >= self.max_per_user:
+                self.stats["rejected_per_user"] += 1
+                raise UserConcurrencyLimitError(f"User {user_id} already has {inflight} generations in flight")
+            self._user_inflight[user_id] = inflight + 1
+        self.stats["in_flight"] += 1
+        try:
+            return await coro_fn(*args, **kwargs)
+        finally:
+            self.stats["in_flight"] -= 1
+            if user_id is not None:
+                remaining = self._user_inflight[user_id] - 1
+                if remaining:
+                    self._user_inflight[user_id] = remaining
+                else:
+                    del self._user_inflight[user_id]
+
+    async def complete(self, prompt, stage):
+        # Returns (chat completion, model). Attempts are timed inside the
+        # semaphore: queueing shows up in route latency, not model latency.
+        def make_call(model):
+            return lambda timeout: self._client.chat.completions.create(
+                messages=[
+                    {"role": "user", "content": prompt}
+                ],
+                model=model,
+                response_format=JSON_MODE,
+                timeout=timeout
+            )
+        async with self._semaphore:
+            return await model_router.call_async(stage, make_call)
+
+    async def chat(self, prompt, strategy, stage):
+        chat_completion, model = await self.complete(prompt, stage)
+        return completion_content(chat_completion, strategy, model), model
+
+
+generation_service = AsyncGenerationService()
+
+
+async def generate_workout_llm_output_async(height, weight, plan, workout, activity, use_cache=True):
+    cache_key = workout_cache_key(height, weight, plan, workout, activity)
+    if use_cache:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cached["response"], cached["prompt"], cached.get("model")
+
+    llm_prompt = build_workout_prompt(height, weight, plan, workout, activity)
+    try:
+        chat_completion, model = await generation_service.complete(llm_prompt, "workout")
+        observe_llm_usage(model, getattr(chat_completion, "usage", None))
+        response = chat_completion.choices[0].message.content
+        if served_by_primary("workout", model):
+            response_cache.set(cache_key, {"response": response, "prompt": llm_prompt, "model": model})
+        return response, llm_prompt, model
+    except Exception as e:
+        logger.error(f"LLM error {e}", exc_info=True)
+        return None, None, None
+
+
+async def _refine_in_background_async(context, draft_response, draft_model, cache_key, initial_prompt, on_refined):
+    start = time.perf_counter()
+    try:
+        refined_response, model = await generation_service.chat(build_refine_prompt(context, draft_response), "speculative", "refine")
+    except Exception as e:
+        logger.error(f"LLM error (speculative refinement) {e}", exc_info=True)
+        return
+    finally:
+        record_generation("speculative", background_seconds_total=time.perf_counter() - start)
+    if served_by_primary("draft", draft_model) and served_by_primary("refine", model):
+        response_cache.set(cache_key, {"response": refined_response, "prompt": initial_prompt, "model": model})
+    if on_refined is not None:
+        try:
+            # on_refined is ordinary blocking code (it writes to Postgres).
+            await asyncio.get_running_loop().run_in_executor(None, on_refined, refined_response, model)
+        except Exception as e:
+            logger.error(f"Error handling speculative refinement result: {e}", exc_info=True)
+
+
+async def generate_workout_with_rag_async(user_id, workout_targets, use_cache=True, strategy=None, on_refined=None, on_refine_started=None):
+    from services.context_services import load_generation_context
+
+    strategy = strategy or DEFAULT_GENERATION_STRATEGY
+    if strategy not in GENERATION_STRATEGIES:
+        raise ValueError(f"Unknown generation strategy: {strategy}")
+
+    start = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    context, context_ok = await loop.run_in_executor(None, load_generation_context, user_id, workout_targets)
+    return await generate_from_context_async(
+        context if context_ok else None, workout_targets, use_cache, strategy, on_refined, start, on_refine_started
+    )
+
+
+async def generate_from_context_async(context, workout_targets, use_cache=True, strategy=None, on_refined=None, start=None,
+                                      on_refine_started=None):
+    # The part of generate_workout_with_rag_async after the context is loaded,
+    # for callers that prefetch contexts themselves (batch generation).
+    # Speculative generation calls on_refine_started() when it hands back a
+    # draft with a refinement still running; a cache hit is already refined.
+    strategy = strategy or DEFAULT_GENERATION_STRATEGY
+    if strategy not in GENERATION_STRATEGIES:
+        raise ValueError(f"Unknown generation strategy: {strategy}")
+
+    start = start or time.perf_counter()
+    record_generation(strategy, requests=1)
+    if not context or not context.user:
+        record_generation(strategy, errors=1)
+        return None, "User not found", None
+    if not context.latest_metric:
+        record_generation(strategy, errors=1)
+        return None, "User metrics not found", None
+
+    cache_key = rag_cache_key(context, workout_targets, strategy)
+    if use_cache:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            record_generation(strategy, cache_hits=1, latency_seconds_total=time.perf_counter() - start)
+            return cached["response"], cached["prompt"], cached.get("model")
+
+    if strategy == "single-pass":
+        initial_prompt = build_single_pass_prompt(context, workout_targets)
+        try:
+            response, model = await generation_service.chat(initial_prompt, strategy, "single-pass")
+        except Exception as e:
+            logger.error(f"LLM error (single pass) {e}", exc_info=True)
+            record_generation(strategy, errors=1)
+            return None, "LLM error (single pass)", None
+        if served_by_primary("single-pass", model):
+            response_cache.set(cache_key, {"response": response, "prompt": initial_prompt, "model": model})
+        record_generation(strategy, latency_seconds_total=time.perf_counter() - start)
+        return response, initial_prompt, model
+
+    initial_prompt = build_rag_prompt(context, workout_targets)
+    try:
+        draft_response, draft_model = await generation_service.chat(initial_prompt, strategy, "draft")
+    except Exception as e:
+        logger.error(f"LLM error (initial draft) {e}", exc_info=True)
+        record_generation(strategy, errors=1)
+        return None, "LLM error (initial draft)", None
+
+    if strategy == "speculative":
+        generation_service.spawn(_refine_in_background_async(
+            context, draft_response, draft_model, cache_key, initial_prompt, on_refined
+        ))
+        if on_refine_started is not None:
+            on_refine_started()
+        record_generation(strategy, latency_seconds_total=time.perf_counter() - start)
+        return draft_response, initial_prompt, draft_model
+
+    try:
+        refined_response, model = await generation_service.chat(build_refine_prompt(context, draft_response), strategy, "refine")
+    except Exception as e:
+        # Serve the draft with the prompt that produced it; the failure shows
+        # up in the log and in the refine_errors stat.
+        logger.error(f"LLM error (refinement), serving the draft: {e}", exc_info=True)
+        record_generation(strategy, refine_errors=1, latency_seconds_total=time.perf_counter() - start)
+        return draft_response, initial_prompt, draft_model
+
+    if served_by_primary("draft", draft_model) and served_by_primary("refine", model):
+        response_cache.set(cache_key, {"response": refined_response, "prompt": initial_prompt, "model": model})
+    record_generation(strategy, latency_seconds_total=time.perf_counter() - start)
+    return refined_response, initial_prompt, model
@@ -0,0 +1,106 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+from services import workout_services
+from services.helper import logger
+from services.context_services import load_generation_contexts
+from services.workout_parser import parse_workout_response
+from services.prompt_builder import PREAMBLE
+from services.llm_processor import rag_cache_key, DEFAULT_GENERATION_STRATEGY
+from services.async_llm import generation_service, generate_from_context_async
+
+MAX_BATCH_ITEMS = int(os.getenv("MAX_BATCH_ITEMS", "100"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+
+
+async def _generate_unique_async(jobs, use_cache, strategy, concurrency):
+    # jobs: {cache_key: (context, targets)}. Each distinct input is generated
+    # once; the semaphore keeps one batch from taking the whole global budget.
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(context, targets):
+        async with semaphore:
+            return await generate_from_context_async(context, list(targets), use_cache, strategy)
+
+    keys = list(jobs)
+    results = await asyncio.gather(*(one(*jobs[key]) for key in keys), return_exceptions=True)
+    return dict(zip(keys, results))
+
+
+def generate_workouts_batch(items, use_cache=True, strategy=None, concurrency=BATCH_LLM_CONCURRENCY):
+    # items: (user_id, workout_targets) pairs. Returns (per-item results, success);
+    # success is False only when the batch as a whole could not run.
+    strategy = strategy or DEFAULT_GENERATION_STRATEGY
+    if strategy == "speculative":
+        strategy = "draft-refine"  # nothing waits on a draft here; store only the final workout
+
+    start = time.perf_counter()
+    contexts, success = load_generation_contexts(items)
+    if not success:
+        return None, False
+
+    results = []
+    jobs = {}
+    item_keys = []
+    for index, (user_id, targets) in enumerate(items):
+        result = {"index": index, "user_id": user_id, "workout": list(targets), "status": "failed"}
+        results.append(result)
+        context = contexts[(user_id, tuple(targets))]
+        if not context.user:
+            result["error"] = "User not found"
+        elif not context.latest_metric:
+            result["error"] = "User metrics not found"
+        if "error" in result:
+            item_keys.append(None)
+            continue
+        key = rag_cache_key(context, targets, strategy)
+        result["deduplicated"] = key in jobs
+        jobs.setdefault(key, (context, tuple(targets)))
+        item_keys.append(key)
+
+    generated = generation_service.run(_generate_unique_async, jobs, use_cache, strategy, concurrency) if jobs else {}
+
+    to_store = []
+    stored_results = []
+    for result, key in zip(results, item_keys):
+        if key is None:
+            continue
+        outcome = generated[key]
+        if isinstance(outcome, Exception):
+            logger.error(f"Batch generation failed for user {result['user_id']}: {outcome}", exc_info=outcome)
+            result["error"] = "LLM error"
+            continue
+        response, prompt, model = outcome
+        if response is None:
+            result["error"] = prompt
+            continue
+        if not isinstance(prompt, str) or not prompt.startswith(PREAMBLE):
+            # Only a built generation prompt may be stored as llm_prompt.
+            logger.error(f"Batch generation for user {result['user_id']} returned no usable prompt: {prompt!r}")
+            result["error"] = "LLM error"
+            continue
+        workout_doc, error = parse_workout_response(response)
+        if error:
+            result["error"] = error
+            continue
+        result["workout_details"] = workout_doc
+        to_store.append((
+            result["user_id"], datetime.now(), ", ".join(result["workout"]), prompt, response, workout_doc, "generated", None, model
+        ))
+        stored_results.append(result)
+
+    if to_store:
+        created, stored = workout_services.create_workouts(to_store)
+        for i, result in enumerate(stored_results):
+            if stored:
+                result["status"] = "succeeded"
+                result["workout_id"] = created[i]["_id"]
+            else:
+                result["error"] = "Failed to store generated workout."
+
+    logger.info(
+        f"Batch of {len(items)} workouts: {len(jobs)} distinct generations, "
+        f"{sum(r['status'] == 'succeeded' for r in results)} stored in {time.perf_counter() - start:.2f}s"
+    )
+    return results, True
@@ -0,0 +1,165 @@
+from configs.config import get_db_connection
+from services.helper import db_operation_failed, logger
+from services.workout_services import SUMMARY_FIELDS, workout_columns_sql
+from services.exercise_index import retriever
+from psycopg2 import Error as Psycopg2Error
+from psycopg2 import sql
+from dataclasses import dataclass, field
+import uuid
+from typing import Optional
+
+
+@dataclass
+class GenerationContext:
+    user_id: str
+    user: Optional[dict] = None
+    latest_metric: Optional[dict] = None
+    recent_workouts: list = field(default_factory=list)
+    exercises: list = field(default_factory=list)
+
+    @property
+    def plan(self):
+        return (self.user or {}).get("plan", "")
+
+    @property
+    def activity(self):
+        return (self.user or {}).get("activity_level", "")
+
+    @property
+    def height(self):
+        return (self.latest_metric or {}).get("height", "")
+
+    @property
+    def weight(self):
+        return (self.latest_metric or {}).get("weight", "")
+
+    @property
+    def workout_summary(self):
+        return " | ".join([
+            f"{w.get('date_generated', '')}: {w.get('muscles_targeted', '')}" for w in self.recent_workouts
+        ])
+
+
+HISTORY_FIELDS = SUMMARY_FIELDS + ("parsed_workout",)
+
+
+def rank_exercises(user_id, user, workout_targets, recent_workouts):
+    if not user:
+        return []
+    return retriever.rank(workout_targets, user_id, user.get("activity_level"), recent_workouts)
+
+
+# Everything the RAG prompt needs from per-user tables, fetched in one round
+# trip. Each CTE is collapsed into a single JSON value so the result is always
+# exactly one row. Candidate exercises are ranked from the in-memory catalog.
+# History uses the workout summary projection (SUMMARY_FIELDS) plus the
+# parsed workout so the ranker can tell which exercises were done recently.
+CONTEXT_SQL = sql.SQL("""
+WITH profile AS (
+    SELECT user_id, plan, activity_level
+    FROM users WHERE user_id = %(user_id)s
+),
+latest_metric AS (
+    SELECT height, weight, recorded_at
+    FROM metrics WHERE user_id = %(user_id)s
+    ORDER BY recorded_at DESC LIMIT 1
+),
+recent_workouts AS (
+    SELECT {history_columns}
+    FROM workouts WHERE user_id = %(user_id)s
+    ORDER BY date_generated DESC LIMIT %(history_limit)s
+)
+SELECT
+    (SELECT row_to_json(p) FROM profile p),
+    (SELECT row_to_json(m) FROM latest_metric m),
+    (SELECT COALESCE(json_agg(w ORDER BY w.date_generated DESC), '[]'::json) FROM recent_workouts w);
+""").format(history_columns=workout_columns_sql(HISTORY_FIELDS))
+
+
+def load_generation_context(user_id, workout_targets, history_limit=3):
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(CONTEXT_SQL, {
+                    "user_id": user_id,
+                    "history_limit": history_limit,
+                })
+                user, latest_metric, recent_workouts = cur.fetchone()
+        context = GenerationContext(
+            user_id=user_id,
+            user=user,
+            latest_metric=latest_metric,
+            recent_workouts=recent_workouts or [],
+            exercises=rank_exercises(user_id, user, workout_targets, recent_workouts),
+        )
+        return context, True
+    except Psycopg2Error as e:
+        return db_operation_failed(e, "load generation context")
+    except Exception as e:
+        logger.critical(f"Unexpected error when loading generation context: {e}", exc_info=True)
+        return None, False
+
+
+# Set-based variant of CONTEXT_SQL for many users at once: one row per
+# requested user, each column a correlated subquery that hits the same
+# per-user indexes as the single-user query.
+BATCH_CONTEXT_SQL = sql.SQL("""
+SELECT
+    ids.user_id::text,
+    (SELECT row_to_json(p) FROM (
+        SELECT user_id, plan, activity_level FROM users WHERE user_id = ids.user_id
+    ) p),
+    (SELECT row_to_json(m) FROM (
+        SELECT height, weight, recorded_at FROM metrics WHERE user_id = ids.user_id
+        ORDER BY recorded_at DESC LIMIT 1
+    ) m),
+    (SELECT COALESCE(json_agg(w ORDER BY w.date_generated DESC), '[]'::json) FROM (
+        SELECT {history_columns} FROM workouts WHERE user_id = ids.user_id
+        ORDER BY date_generated DESC LIMIT %(history_limit)s
+    ) w)
+FROM unnest(%(user_ids)s::uuid[]) AS ids(user_id);
+""").format(history_columns=workout_columns_sql(HISTORY_FIELDS))
+
+
+def load_generation_contexts(items, history_limit=3):
+    # items: (user_id, workout_targets) pairs. Returns ({(user_id, targets): ctx}, success)
+    # with targets as a tuple; unknown or malformed user ids get a context with no user.
+    user_ids = []
+    for user_id, _ in items:
+        try:
+            user_ids.append(str(uuid.UUID(str(user_id))))
+        except ValueError:
+            continue
+    user_ids = list(dict.fromkeys(user_ids))
+    try:
+        rows = {}
+        if user_ids:
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute(BATCH_CONTEXT_SQL, {
+                        "user_ids": user_ids,
+                        "history_limit": history_limit,
+                    })
+                    rows = {row[0]: row[1:] for row in cur.fetchall()}
+        contexts = {}
+        for user_id, workout_targets in items:
+            key = (user_id, tuple(workout_targets))
+            if key in contexts:
+                continue
+            try:
+                user, latest_metric, recent_workouts = rows.get(str(uuid.UUID(str(user_id))), (None, None, []))
+            except ValueError:
+                user, latest_metric, recent_workouts = None, None, []
+            contexts[key] = GenerationContext(
+                user_id=user_id,
+                user=user,
+                latest_metric=latest_metric,
+                recent_workouts=recent_workouts or [],
+                exercises=rank_exercises(user_id, user, workout_targets, recent_workouts),
+            )
+        return contexts, True
+    except Psycopg2Error as e:
+        return db_operation_failed(e, "load generation contexts")
+    except Exception as e:
+        logger.critical(f"Unexpected error when loading generation contexts: {e}", exc_info=True)
+        return None, False
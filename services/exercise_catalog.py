@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from configs.config import get_db_connection
+from services.helper import WriteStamps
+
+EXERCISE_SELECT = """
+SELECT exercise_id, exercise_name, primary_muscle_group, secondary_muscle_group,
+       equipment, difficulty, instructions, video_url,
+       custom, user_id, created_at
+FROM exercises
+"""
+
+def serialize_exercise(exercise_dict):
+    if 'exercise_id' in exercise_dict and isinstance(exercise_dict['exercise_id'], uuid.UUID):
+        exercise_dict['exercise_id'] = str(exercise_dict['exercise_id'])
+    if 'user_id' in exercise_dict and isinstance(exercise_dict['user_id'], uuid.UUID):
+        exercise_dict['user_id'] = str(exercise_dict['user_id'])
+    if 'created_at' in exercise_dict and isinstance(exercise_dict['created_at'], datetime):
+        exercise_dict['created_at'] = exercise_dict['created_at'].isoformat()
+    return exercise_dict
+
+def _copy(exercise):
+    copied = dict(exercise)
+    copied["primary_muscle_group"] = list(exercise.get("primary_muscle_group") or [])
+    copied["secondary_muscle_group"] = list(exercise.get("secondary_muscle_group") or [])
+    return copied
+
+def _fetch(where_sql, params):
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(EXERCISE_SELECT + where_sql, params)
+            rows = cur.fetchall()
+            columns = [desc[0] for desc in cur.description]
+            return [serialize_exercise(dict(zip(columns, row))) for row in rows]
+
+def _muscle_index(exercises):
+    by_muscle = {}
+    for ex in exercises:
+        name = ex["exercise_name"]
+        for muscle in dict.fromkeys((ex.get("primary_muscle_group") or []) + (ex.get("secondary_muscle_group") or [])):
+            by_muscle.setdefault(muscle, []).append(name)
+    return by_muscle
+
+
+class ExerciseCatalog:
+    # The shared library is static between imports, so it is loaded once and
+    # served from memory. The TTL bounds staleness for writes made by other
+    # processes; writes through create_exercise invalidate immediately.
+    # Custom exercises are cached per user, least recently used first out.
+
+    def __init__(self, ttl=300.0, max_users=1000):
+        self.ttl = ttl
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._loaded = None  # (by_name, by_muscle, loaded_at), swapped as one
+        self._custom = OrderedDict()  # user_id -> (loaded_at, by_name, by_muscle)
+        self._custom_writes = WriteStamps(max_users)
+        self.stats = {"hits": 0, "misses": 0, "loads": 0, "invalidations": 0, "stale_fills": 0}
+
+    def _library(self):
+        loaded = self._loaded
+        if loaded is not None and time.monotonic() - loaded[2] < self.ttl:
+            self.stats["hits"] += 1
+            return loaded[0], loaded[1]
+        with self._lock:
+            loaded = self._loaded
+            if loaded is None or time.monotonic() - loaded[2] >= self.ttl:
+                self.stats["misses"] += 1
+                exercises = _fetch("WHERE NOT custom AND deleted_at IS NULL ORDER BY exercise_name;", ())
+                loaded = ({ex["exercise_name"]: ex for ex in exercises}, _muscle_index(exercises), time.monotonic())
+                self._loaded = loaded
+                self.stats["loads"] += 1
+            else:
+                self.stats["hits"] += 1
+            return loaded[0], loaded[1]
+
+    def _custom_for_user(self, user_id):
+        if not user_id:
+            return {}, {}
+        with self._lock:
+            entry = self._custom.get(user_id)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self._custom.move_to_end(user_id)
+                return entry[1], entry[2]
+            token = self._custom_writes.token()
+        # Fetched outside the lock; an invalidate() meanwhile wins.
+        exercises = _fetch("WHERE custom AND user_id = %s ORDER BY exercise_name;", (user_id,))
+        by_name = {ex["exercise_name"]: ex for ex in exercises}
+        by_muscle = _muscle_index(exercises)
+        with self._lock:
+            if self._custom_writes.changed_since(user_id, token):
+                self.stats["stale_fills"] += 1
+            else:
+                self._custom[user_id] = (time.monotonic(), by_name, by_muscle)
+                self._custom.move_to_end(user_id)
+                while len(self._custom) > self.max_users:
+                    self._custom.popitem(last=False)
+        return by_name, by_muscle
+
+    def by_muscle(self, muscle_group, user_id=None):
+        by_name, by_muscle = self._library()
+        result = [_copy(by_name[name]) for name in by_muscle.get(muscle_group, [])]
+        custom_by_name, custom_by_muscle = self._custom_for_user(user_id)
+        result.extend(_copy(custom_by_name[name]) for name in custom_by_muscle.get(muscle_group, []))
+        return result
+
+    def by_name(self, name, user_id=None):
+        by_name, _ = self._library()
+        if name in by_name:
+            return _copy(by_name[name])
+        custom_by_name, _ = self._custom_for_user(user_id)
+        if name in custom_by_name:
+            return _copy(custom_by_name[name])
+        return None
+
+    def library(self):
+        # The live name -> exercise map for the shared library. Read only;
+        # a new dict replaces it whenever the catalog reloads.
+        by_name, _ = self._library()
+        return by_name
+
+    def custom(self, user_id):
+        by_name, _ = self._custom_for_user(user_id)
+        return by_name
+
+    def all(self):
+        by_name, _ = self._library()
+        return [_copy(ex) for ex in by_name.values()]
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            self.stats["invalidations"] += 1
+            if user_id:
+                self._custom_writes.touch(user_id)
+                self._custom.pop(user_id, None)
+            else:
+                self._custom_writes.touch_all()
+                self._loaded = None
+                self._custom.clear()
+
+
+catalog = ExerciseCatalog(
+    ttl=float(os.getenv("EXERCISE_CATALOG_TTL", "300")),
+    max_users=int(os.getenv("EXERCISE_CATALOG_MAX_USERS", "1000")),
+)
@@ -0,0 +1,270 @@
+import hashlib
+import os
+import re
+import threading
+import numpy as np
+from services.exercise_catalog import catalog
+from services.helper import logger
+
+EXERCISE_INDEX_PATH = os.getenv("EXERCISE_INDEX_PATH", os.path.join("data", "exercise_index.npz"))
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "10"))
+
+# Okapi BM25 parameters.
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Field weights: how many times a field's tokens are counted in a document.
+FIELD_WEIGHTS = {"p": 3, "s": 1, "n": 1, "e": 1}
+# Added to the normalised text score (0..1) for a matching difficulty.
+DIFFICULTY_WEIGHT = float(os.getenv("RAG_DIFFICULTY_WEIGHT", "0.3"))
+# Multiplier for exercises in the user's recent workouts and per recently
+# trained muscle an exercise also works, so the prompt gets some variety.
+RECENT_EXERCISE_PENALTY = float(os.getenv("RAG_RECENT_EXERCISE_PENALTY", "0.5"))
+RECENT_MUSCLE_PENALTY = float(os.getenv("RAG_RECENT_MUSCLE_PENALTY", "0.85"))
+
+DIFFICULTY_LEVELS = {"beginner": 0, "intermediate": 1, "expert": 2}
+ACTIVITY_DIFFICULTY = {"Sedentary": 0, "Lightly Active": 0, "Active": 1, "Extremely Active": 2}
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _words(text):
+    return _WORD.findall(str(text or "").lower())
+
+
+def document_terms(exercise):
+    # Field-prefixed terms, so "chest" as a primary muscle and "chest" in a
+    # name are different terms with their own idf.
+    terms = []
+    for muscle in exercise.get("primary_muscle_group") or []:
+        terms += ["p:" + str(muscle).lower()] * FIELD_WEIGHTS["p"]
+    for muscle in exercise.get("secondary_muscle_group") or []:
+        terms += ["s:" + str(muscle).lower()] * FIELD_WEIGHTS["s"]
+    terms += ["n:" + word for word in _words(exercise.get("exercise_name"))] * FIELD_WEIGHTS["n"]
+    terms += ["e:" + word for word in _words(exercise.get("equipment"))] * FIELD_WEIGHTS["e"]
+    return terms
+
+
+def content_hash(exercise):
+    # Changes whenever anything the row's weights or difficulty depend on does.
+    text = "\x1f".join(document_terms(exercise) + [str(exercise.get("difficulty") or "").lower()])
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def query_terms(workout_targets):
+    terms = []
+    for target in workout_targets:
+        muscle = str(target).strip().lower()
+        terms += ["p:" + muscle, "s:" + muscle]
+        terms += ["n:" + word for word in _words(muscle)]
+    return terms
+
+
+class ExerciseIndex:
+    # BM25 weights for the exercise library as a dense (exercises x terms)
+    # float32 matrix. Scoring a query is one matrix-vector product.
+
+    def __init__(self, names, vocabulary, idf, avg_length, weights, difficulty, hashes):
+        self.names = list(names)
+        self.hashes = list(hashes)
+        self.vocabulary = list(vocabulary)
+        self.term_ids = {term: i for i, term in enumerate(self.vocabulary)}
+        self.idf = np.asarray(idf, dtype=np.float32)
+        self.avg_length = float(avg_length)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.difficulty = np.asarray(difficulty, dtype=np.int8)
+        self.rows = {name: i for i, name in enumerate(self.names)}
+
+    @classmethod
+    def build(cls, exercises):
+        documents = [document_terms(ex) for ex in exercises]
+        vocabulary = sorted({term for terms in documents for term in terms})
+        term_ids = {term: i for i, term in enumerate(vocabulary)}
+        counts = np.zeros((len(documents), len(vocabulary)), dtype=np.float32)
+        for row, terms in enumerate(documents):
+            for term in terms:
+                counts[row, term_ids[term]] += 1
+        document_frequency = (counts > 0).sum(axis=0)
+        idf = np.log(1 + (len(documents) - document_frequency + 0.5) / (document_frequency + 0.5))
+        lengths = counts.sum(axis=1)
+        avg_length = float(lengths.mean()) if len(documents) else 1.0
+        index = cls([ex["exercise_name"] for ex in exercises], vocabulary, idf, avg_length or 1.0,
+                    np.zeros((0, len(vocabulary)), dtype=np.float32), [], [content_hash(ex) for ex in exercises])
+        index.weights = index._bm25(counts, lengths)
+        index.difficulty = difficulty_levels(exercises)
+        return index
+
+    def _bm25(self, counts, lengths):
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / self.avg_length)
+        return (self.idf * counts * (BM25_K1 + 1) / (counts + norm[:, None])).astype(np.float32)
+
+    def vectorize(self, exercises):
+        # BM25 rows for exercises that are not in the index (custom exercises
+        # and library exercises added or changed since the last build), using
+        # the index's idf. Terms the index has never seen cannot match a query
+        # term anyway.
+        counts = np.zeros((len(exercises), len(self.vocabulary)), dtype=np.float32)
+        lengths = np.zeros(len(exercises), dtype=np.float32)
+        for row, ex in enumerate(exercises):
+            terms = document_terms(ex)
+            lengths[row] = len(terms)
+            for term in terms:
+                column = self.term_ids.get(term)
+                if column is not None:
+                    counts[row, column] += 1
+        return self._bm25(counts, lengths)
+
+    def query_vector(self, workout_targets):
+        vector = np.zeros(len(self.vocabulary), dtype=np.float32)
+        for term in query_terms(workout_targets):
+            column = self.term_ids.get(term)
+            if column is not None:
+                vector[column] += 1
+        return vector
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f, names=np.array(self.names, dtype=str), vocabulary=np.array(self.vocabulary, dtype=str),
+                idf=self.idf, avg_length=np.float32(self.avg_length), weights=self.weights, difficulty=self.difficulty,
+                hashes=np.array(self.hashes, dtype=str),
+            )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["names"].tolist(), data["vocabulary"].tolist(), data["idf"], float(data["avg_length"]),
+                       data["weights"], data["difficulty"], data["hashes"].tolist())
+
+
+def difficulty_levels(exercises):
+    # -1 for anything outside beginner/intermediate/expert.
+    return np.array([DIFFICULTY_LEVELS.get(str(ex.get("difficulty") or "").lower(), -1) for ex in exercises], dtype=np.int8)
+
+
+def recent_exercise_names(recent_workouts):
+    names = set()
+    for workout in recent_workouts or []:
+        for item in workout.get("parsed_workout") or []:
+            if isinstance(item, dict) and item.get("Exercise"):
+                names.add(item["Exercise"])
+    return names
+
+
+def recent_muscles(recent_workouts, workout_targets):
+    # Muscles trained recently that are not being targeted today.
+    targets = {str(t).strip().lower() for t in workout_targets}
+    muscles = set()
+    for workout in recent_workouts or []:
+        for muscle in str(workout.get("muscles_targeted") or "").split(","):
+            muscle = muscle.strip().lower()
+            if muscle and muscle not in targets:
+                muscles.add(muscle)
+    return muscles
+
+
+class ExerciseRetriever:
+    # Ranks the catalog for a generation request. The library index is built
+    # offline by scripts/build_exercise_index.py; without that file it is
+    # built from the catalog on first use. Rows are reused only for exercises
+    # whose content hash still matches; added or changed exercises are scored
+    # on the fly against the live catalog, so a stale index costs some CPU
+    # but not wrong candidates (its idf does drift until the next build).
+
+    def __init__(self, path=EXERCISE_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._index = None
+        # (library, index, names, weights, difficulty), published as one so
+        # unlocked readers never mix rows from two builds.
+        self._matrix = None
+
+    def _load_index(self):
+        if self._index is None:
+            try:
+                self._index = ExerciseIndex.load(self.path)
+                logger.info(f"Loaded exercise index with {len(self._index.names)} exercises from {self.path}")
+            except FileNotFoundError:
+                logger.warning(f"No exercise index at {self.path}, building one from the catalog")
+                self._index = ExerciseIndex.build(list(catalog.library().values()))
+            except Exception as e:
+                logger.error(f"Could not load exercise index from {self.path}: {e}", exc_info=True)
+                self._index = ExerciseIndex.build(list(catalog.library().values()))
+        return self._index
+
+    def _library_matrix(self):
+        # Index rows for exercises still in the library plus rows for new
+        # ones; recomputed only when the catalog reloads.
+        library = catalog.library()
+        matrix = self._matrix
+        if matrix is not None and matrix[0] is library:
+            return matrix[1:]
+        with self._lock:
+            matrix = self._matrix
+            if matrix is None or matrix[0] is not library:
+                index = self._load_index()
+                rows, missing = [], []
+                for name, ex in library.items():
+                    row = index.rows.get(name)
+                    if row is not None and index.hashes[row] == content_hash(ex):
+                        rows.append(row)
+                    else:
+                        missing.append(ex)
+                matrix = (
+                    library, index,
+                    [index.names[row] for row in rows] + [ex["exercise_name"] for ex in missing],
+                    np.vstack([index.weights[rows], index.vectorize(missing)]),
+                    np.concatenate([index.difficulty[rows], difficulty_levels(missing)]),
+                )
+                self._matrix = matrix
+            return matrix[1:]
+
+    def rank(self, workout_targets, user_id=None, activity_level=None, recent_workouts=(), k=RAG_TOP_K):
+        index, names, weights, difficulty = self._library_matrix()
+        custom = list(catalog.custom(user_id).values()) if user_id else []
+        if custom:
+            names = names + [ex["exercise_name"] for ex in custom]
+            weights = np.vstack([weights, index.vectorize(custom)])
+            difficulty = np.concatenate([difficulty, difficulty_levels(custom)])
+        if not names:
+            return []
+
+        scores = weights @ index.query_vector(workout_targets)
+        matched = scores > 0
+        if not matched.any():
+            return []
+        scores = scores / scores.max()
+
+        level = ACTIVITY_DIFFICULTY.get(activity_level)
+        if level is not None:
+            known = difficulty >= 0
+            scores[known] += DIFFICULTY_WEIGHT * (1 - np.abs(difficulty[known] - level) / 2)
+
+        recent_names = recent_exercise_names(recent_workouts)
+        if recent_names:
+            scores[np.fromiter((name in recent_names for name in names), dtype=bool, count=len(names))] *= RECENT_EXERCISE_PENALTY
+        trained = recent_muscles(recent_workouts, workout_targets)
+        if trained:
+            overlap = index.query_vector(trained)
+            hits = (weights[:, overlap > 0] > 0).sum(axis=1) if overlap.any() else 0
+            scores *= np.power(RECENT_MUSCLE_PENALTY, hits)
+
+        scores[~matched] = -np.inf
+        k = min(k, int(matched.sum()))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        result = []
+        for row in top:
+            exercise = catalog.by_name(names[row], user_id)
+            if exercise is not None:
+                result.append(exercise)
+        return result
+
+    def invalidate(self):
+        with self._lock:
+            self._index = None
+            self._matrix = None
+
+
+retriever = ExerciseRetriever()
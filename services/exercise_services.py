@@ -1,5 +1,6 @@
 from configs.config import get_db_connection
 from services.helper import db_operation_failed, check_row_count, logger
+from services.exercise_catalog import catalog
 from psycopg2 import Error as Psycopg2Error
 import uuid
 from datetime import datetime
@@ -25,6 +26,7 @@ def create_exercise(name, primary_muscle_group, secondary_muscle_group, equipmen
                 ))
                 created_exercise_id = cur.fetchone()[0]
                 conn.commit()
+                catalog.invalidate(user_id_custom if is_custom else None)
                 return {"_id": str(created_exercise_id)}, True
     except Psycopg2Error as e:
         return db_operation_failed(e, "create exercise")
@@ -32,15 +34,19 @@ def create_exercise(name, primary_muscle_group, secondary_muscle_group, equipmen
         logger.critical(f"Unexpected error when creating exercise: {e}", exc_info=True)
         return None, False
 
-def read_exercise_by_name(name):
+def read_exercise_by_name(name, user_id=None):
     try:
+        cached = catalog.by_name(name, user_id)
+        if cached is not None:
+            return cached, True
+        # Not in the shared library: may be another user's custom exercise.
         with get_db_connection() as conn:
             with conn.cursor() as cur:
                 select_sql = """
                 SELECT exercise_id, exercise_name, primary_muscle_group, secondary_muscle_group,
                        equipment, difficulty, instructions, video_url,
                        custom, user_id, created_at
-                FROM exercises WHERE exercise_name = %s;
+                FROM exercises WHERE exercise_name = %s AND deleted_at IS NULL;
                 """
                 cur.execute(select_sql, (name,))
                 exercise_data = cur.fetchone()
@@ -62,33 +68,9 @@ def read_exercise_by_name(name):
         logger.critical(f"Unexpected error when reading exercise by name: {e}", exc_info=True)
         return None, False
 
-def get_exercises_by_muscle_group(muscle_group):
+def get_exercises_by_muscle_group(muscle_group, user_id=None):
     try:
-        with get_db_connection() as conn:
-            with conn.cursor() as cur:
-                select_sql = """
-                SELECT exercise_id, exercise_name, primary_muscle_group, secondary_muscle_group,
-                       equipment, difficulty, instructions, video_url,
-                       custom, user_id, created_at
-                FROM exercises 
-                WHERE %s = ANY(primary_muscle_group) OR %s = ANY(secondary_muscle_group);
-                """
-                cur.execute(select_sql, (muscle_group, muscle_group))
-                exercises = cur.fetchall()
-                if cur.description is None:
-                    return [], True
-                columns = [desc[0] for desc in cur.description]
-                result = []
-                for row in exercises:
-                    exercise_dict = dict(zip(columns, row))
-                    if 'exercise_id' in exercise_dict and isinstance(exercise_dict['exercise_id'], uuid.UUID):
-                        exercise_dict['exercise_id'] = str(exercise_dict['exercise_id'])
-                    if 'user_id' in exercise_dict and isinstance(exercise_dict['user_id'], uuid.UUID):
-                        exercise_dict['user_id'] = str(exercise_dict['user_id'])
-                    if 'created_at' in exercise_dict and isinstance(exercise_dict['created_at'], datetime):
-                        exercise_dict['created_at'] = exercise_dict['created_at'].isoformat()
-                    result.append(exercise_dict)
-                return result, True
+        return catalog.by_muscle(muscle_group, user_id), True
     except Psycopg2Error as e:
         return db_operation_failed(e, "get exercises by muscle group")
     except Exception as e:
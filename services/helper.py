@@ -1,7 +1,12 @@
 import logging
+import os
+import base64
+import binascii
+import json
+from collections import OrderedDict
 from psycopg2 import Error as Psycopg2Error
 
-logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "ERROR").upper(), format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 def db_operation_failed(e, operation_name):
@@ -10,3 +15,45 @@ def db_operation_failed(e, operation_name):
 
 def check_row_count(row_count):
     return row_count > 0
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, binascii.Error, UnicodeError) as e:
+        raise ValueError(f"Malformed cursor: {cursor}") from e
+
+class WriteStamps:
+    # Per-key write stamps for caches that read from the database outside
+    # their lock: take token() before the read and store the result only if
+    # not changed_since(key, token). Keeps at most max_keys stamps; a key whose
+    # stamp was dropped counts as written at the newest dropped stamp, which
+    # only ever rejects more fills. Not locked; callers hold their own lock.
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._clock = 0
+        self._floor = 0
+        self._stamps = OrderedDict()
+
+    def token(self):
+        return self._clock
+
+    def touch(self, key):
+        self._clock += 1
+        self._stamps[key] = self._clock
+        self._stamps.move_to_end(key)
+        while len(self._stamps) > self.max_keys:
+            self._floor = self._stamps.popitem(last=False)[1]
+
+    def touch_all(self):
+        self._clock += 1
+        self._stamps.clear()
+        self._floor = self._clock
+
+    def changed_since(self, key, token):
+        return self._stamps.get(key, self._floor) > token
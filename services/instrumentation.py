@@ -0,0 +1,264 @@
+import bisect
+import os
+import threading
+import time
+from services.helper import logger
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+
+# Seconds. Covers cached reads (sub-millisecond) up to slow LLM generations.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels_text(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_labels_text(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    # Fixed buckets; observe() is a bisect and a few integer adds under a lock.
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels_text(self.labelnames, key, ('le', format(bound, 'g')))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels_text(self.labelnames, key, ('le', '+Inf'))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels_text(self.labelnames, key)} {series[-2]}")
+            lines.append(f"{self.name}_count{_labels_text(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        labels = dict(self.labels)
+        if "outcome" in self.histogram.labelnames:
+            labels.setdefault("outcome", "error" if exc_type else "ok")
+        self.histogram.observe(time.perf_counter() - self.start, **labels)
+        return False
+
+
+class GaugeCollector:
+    # Point-in-time values read from existing stats dicts at scrape time, so
+    # caches and pools need no extra bookkeeping on their hot paths.
+
+    def __init__(self, name, help_text, labelnames, collect):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.collect = collect  # () -> iterable of (label values tuple, value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        try:
+            for key, value in self.collect():
+                lines.append(f"{self.name}{_labels_text(self.labelnames, key)} {value}")
+        except Exception as e:
+            logger.error(f"Failed to collect {self.name}: {e}", exc_info=True)
+        return lines
+
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def register(metric):
+    with _registry_lock:
+        _registry.append(metric)
+    return metric
+
+
+def render_prometheus():
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUEST_SECONDS = register(Histogram(
+    "http_request_duration_seconds", "Flask request latency by route template.", ("method", "route", "status")
+))
+DB_CALL_SECONDS = register(Histogram(
+    "db_call_duration_seconds", "Time a service function held a pooled connection.", ("function",)
+))
+LLM_REQUEST_SECONDS = register(Histogram(
+    "llm_request_duration_seconds", "Groq chat completion latency.", ("model", "mode", "outcome")
+))
+LLM_TOKENS = register(Counter(
+    "llm_tokens_total", "Tokens reported by Groq usage.", ("model", "type")
+))
+LLM_PROMPT_TOKENS = register(Histogram(
+    "llm_prompt_tokens", "Locally counted prompt tokens per built prompt, by section.", ("kind", "section"),
+    buckets=(25, 50, 100, 200, 300, 400, 600, 800, 1200, 1600, 2400, 3200),
+))
+LLM_RESILIENCE_EVENTS = register(Counter(
+    "llm_resilience_events_total", "Attempts, retries, hedges, deadlines and circuit breaker decisions.", ("model", "event")
+))
+LLM_MODEL_FALLBACKS = register(Counter(
+    "llm_model_fallbacks_total", "Calls moved from a stage's primary model to its fallback.", ("stage", "model", "reason")
+))
+WORKOUT_PARSES = register(Counter(
+    "workout_parse_total", "LLM workout outputs by parse outcome (ok, repaired, failed, llm_error).", ("outcome",)
+))
+PROMPT_SECTIONS_TRIMMED = register(Counter(
+    "prompt_sections_trimmed_total", "Prompt sections cut to fit their token budget.", ("kind", "section")
+))
+
+
+def observe_db_call(function, seconds):
+    DB_CALL_SECONDS.observe(seconds, function=function)
+
+
+def observe_llm_usage(model, usage):
+    if usage is None:
+        return
+    LLM_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, model=model, type="prompt")
+    LLM_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, model=model, type="completion")
+
+
+def _stats_collector(name, help_text, sources):
+    # sources: {cache name: callable returning a stats dict}
+    def collect():
+        for source, stats_fn in sources.items():
+            for key, value in stats_fn().items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    yield (source, key), value
+    return register(GaugeCollector(name, help_text, ("source", "stat"), collect))
+
+
+def register_default_collectors():
+    from configs.config import get_db_pool
+    from services.llm_cache import response_cache
+    from services.exercise_catalog import catalog
+    from services.metric_services import latest_metrics_cache
+    from services.async_llm import generation_service
+    from services.llm_processor import get_generation_stats
+    from services.llm_resilience import resilient_llm
+
+    def catalog_stats():
+        stats = dict(catalog.stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def latest_metrics_stats():
+        stats = dict(latest_metrics_cache.stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    _stats_collector("app_cache_stat", "Cache counters and hit rates.", {
+        "llm_response": response_cache.stats,
+        "exercise_catalog": catalog_stats,
+        "latest_metrics": latest_metrics_stats,
+    })
+    _stats_collector("app_pool_stat", "Connection and concurrency pool state.", {
+        "db_pool": lambda: get_db_pool().stats(),
+        "llm_generation": lambda: dict(generation_service.stats),
+    })
+
+    def generation_collect():
+        for strategy, stats in get_generation_stats().items():
+            for key, value in stats.items():
+                yield (strategy, key), value
+    register(GaugeCollector("app_generation_stat", "Per-strategy workout generation counters.", ("strategy", "stat"), generation_collect))
+
+    def breaker_collect():
+        for model, state in resilient_llm.stats().items():
+            yield (model,), state
+    register(GaugeCollector("llm_circuit_breaker_state", "Circuit breaker state per model (0 closed, 1 half open, 2 open).", ("model",), breaker_collect))
+
+
+def init_app(app):
+    from flask import g, request, Response
+
+    @app.before_request
+    def _start_timer():
+        g._request_start = time.perf_counter()
+
+    @app.after_request
+    def _record_latency(response):
+        start = getattr(g, "_request_start", None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start, method=request.method, route=route, status=response.status_code
+            )
+        return response
+
+    @app.route("/internal/metrics", methods=["GET"])
+    def prometheus_metrics():
+        return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+    register_default_collectors()
@@ -0,0 +1,179 @@
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+from services import workout_services
+from services.helper import logger
+from services.workout_parser import parse_workout_response
+from services.async_llm import generation_service, generate_workout_with_rag_async, generate_workout_llm_output_async, UserConcurrencyLimitError
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+JOB_RETRY_DELAY_SECONDS = 1.0
+# Requeues allowed while the user is at their concurrency limit, so a job
+# waits about this many seconds for a slot before it fails.
+JOB_MAX_REQUEUES = int(os.getenv("JOB_MAX_REQUEUES", "60"))
+
+
+def _run_rag_job(payload):
+    response, prompt, model = generation_service.run(
+        generate_workout_with_rag_async, payload["user_id"], payload["workout"],
+        user_id=payload["user_id"], use_cache=payload.get("use_cache", True), strategy=payload.get("strategy"),
+    )
+    if response is None:
+        raise RuntimeError(prompt)
+    return response, prompt, ", ".join(payload["workout"]), model
+
+
+def _run_direct_job(payload):
+    response, prompt, model = generation_service.run(
+        generate_workout_llm_output_async, payload["height"], payload["weight"], payload["plan"],
+        payload["workout"], payload["activity"], user_id=payload["user_id"], use_cache=payload.get("use_cache", True),
+    )
+    if response is None:
+        raise RuntimeError("Failed to generate workout from AI.")
+    return response, prompt, payload["workout"], model
+
+
+JOB_KINDS = {
+    "rag": _run_rag_job,
+    "direct": _run_direct_job,
+}
+
+
+class JobQueue:
+    # In-process stand-in for a real broker: a local queue drained by a small
+    # thread pool, with job state kept in memory.
+
+    def __init__(self, workers=JOB_WORKERS, retention=JOB_RETENTION_SECONDS):
+        self.workers = workers
+        self.retention = retention
+        self._queue = queue.Queue()
+        self._jobs = {}
+        self._idempotency = {}  # idempotency key -> job_id
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _ensure_workers(self):
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _expire_locked(self):
+        cutoff = time.time() - self.retention
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job["status"] in ("succeeded", "failed") and job["updated_ts"] < cutoff]
+        for job_id in expired:
+            job = self._jobs.pop(job_id)
+            if job["idempotency_key"]:
+                self._idempotency.pop(job["idempotency_key"], None)
+
+    def submit(self, kind, payload, idempotency_key=None):
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        self._ensure_workers()
+        if idempotency_key:
+            # Keys are client-chosen, so scope them to the user they act for.
+            idempotency_key = f"{payload.get('user_id')}:{idempotency_key}"
+        with self._lock:
+            self._expire_locked()
+            if idempotency_key and idempotency_key in self._idempotency:
+                return self._public(self._jobs[self._idempotency[idempotency_key]]), False
+            now = datetime.now().isoformat()
+            job = {
+                "job_id": str(uuid.uuid4()),
+                "kind": kind,
+                "status": "queued",
+                "payload": payload,
+                "idempotency_key": idempotency_key,
+                "result": None,
+                "error": None,
+                "created_at": now,
+                "updated_at": now,
+                "updated_ts": time.time(),
+                "requeues": 0,
+            }
+            self._jobs[job["job_id"]] = job
+            if idempotency_key:
+                self._idempotency[idempotency_key] = job["job_id"]
+        self._queue.put(job["job_id"])
+        return self._public(job), True
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._public(job) if job else None
+
+    def _public(self, job):
+        return {k: v for k, v in job.items() if k not in ("payload", "updated_ts", "requeues")}
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(fields)
+            job["updated_at"] = datetime.now().isoformat()
+            job["updated_ts"] = time.time()
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                with self._lock:
+                    job = self._jobs.get(job_id)
+                if job is not None:
+                    self._run(job)
+            except Exception as e:
+                logger.critical(f"Unexpected error in job worker for job {job_id}: {e}", exc_info=True)
+                self._update(job_id, status="failed", error="Unexpected error during workout generation.")
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job):
+        job_id = job["job_id"]
+        payload = job["payload"]
+        self._update(job_id, status="running")
+        try:
+            response, prompt, muscles_targeted, model = JOB_KINDS[job["kind"]](payload)
+        except UserConcurrencyLimitError as e:
+            # The user already has generations in flight; try again shortly
+            # rather than failing a job the client is still waiting on.
+            if job["requeues"] >= JOB_MAX_REQUEUES:
+                logger.error(f"Giving up on job {job_id} after {job['requeues']} requeues: {e}")
+                self._update(job_id, status="failed", error=str(e))
+                return
+            self._update(job_id, status="queued", requeues=job["requeues"] + 1)
+            threading.Timer(JOB_RETRY_DELAY_SECONDS, self._queue.put, args=(job_id,)).start()
+            return
+        except Exception as e:
+            logger.error(f"Workout generation failed for job {job_id}: {e}", exc_info=True)
+            self._update(job_id, status="failed", error=str(e))
+            return
+
+        workout_doc, error = parse_workout_response(response)
+        if error:
+            self._update(job_id, status="failed", error=error)
+            return
+
+        workout_result, success = workout_services.create_workout(
+            payload["user_id"], datetime.now(), muscles_targeted, prompt, response, workout_doc, "generated", None, model
+        )
+        if not success:
+            self._update(job_id, status="failed", error="Failed to store generated workout.")
+            return
+        self._update(job_id, status="succeeded", result={
+            "workout_id": str(workout_result["_id"]),
+            "workout_details": workout_doc,
+        })
+
+
+job_queue = JobQueue()
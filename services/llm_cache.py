@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+from services.helper import logger
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return " ".join(value.split()).lower()
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float, Decimal)):
+        # 180, 180.0, "180.00" from NUMERIC columns all mean the same weight.
+        return format(round(float(value), 2), "g")
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple, set)):
+        return [_normalize(v) for v in value]
+    return _normalize(str(value))
+
+
+def fingerprint(kind, model, **inputs):
+    normalized = {k: _normalize(v) for k, v in inputs.items()}
+    # Target order does not change what is being asked for.
+    if isinstance(normalized.get("targets"), list):
+        normalized["targets"] = sorted(normalized["targets"])
+    payload = json.dumps({"kind": kind, "model": model, "inputs": normalized}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cache_bypass_requested(request):
+    if "no-cache" in request.headers.get("Cache-Control", "").lower():
+        return True
+    return request.args.get("no_cache", "").lower() in ("1", "true", "yes")
+
+
+class SQLiteBackend:
+    # Expired rows are purged at startup and every purge_every writes; the
+    # same pass trims the table to max_rows, dropping the rows closest to
+    # expiry, so the file stays bounded while the process runs.
+
+    def __init__(self, path, max_rows=100000, purge_every=100):
+        self.max_rows = max_rows
+        self.purge_every = purge_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+        self.purge_expired()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None, None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, expires_at):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+            self._writes += 1
+            if self._writes % self.purge_every == 0:
+                self._purge_locked()
+
+    def purge_expired(self):
+        with self._lock, self._conn:
+            self._purge_locked()
+
+    def _purge_locked(self):
+        self._conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+        self._conn.execute(
+            "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_rows,),
+        )
+
+
+class ResponseCache:
+    # In-memory LRU with a TTL, optionally backed by a persistent store that
+    # survives restarts and is shared between worker processes.
+
+    def __init__(self, max_entries=1024, ttl=3600.0, backend=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "backend_hits": 0, "evictions": 0, "expirations": 0, "stores": 0}
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry[0]
+                del self._entries[key]
+                self._stats["expirations"] += 1
+
+        if self.backend is not None:
+            try:
+                value, expires_at = self.backend.get(key)
+                if value is not None and expires_at > now:
+                    with self._lock:
+                        self._store_locked(key, value, expires_at)
+                        self._stats["hits"] += 1
+                        self._stats["backend_hits"] += 1
+                    return value
+            except Exception as e:
+                logger.error(f"LLM cache backend read failed: {e}", exc_info=True)
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def _store_locked(self, key, value, expires_at):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def set(self, key, value):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._store_locked(key, value, expires_at)
+            self._stats["stores"] += 1
+        if self.backend is not None:
+            try:
+                self.backend.set(key, value, expires_at)
+            except Exception as e:
+                logger.error(f"LLM cache backend write failed: {e}", exc_info=True)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+def _build_cache():
+    backend = None
+    sqlite_path = os.getenv("LLM_CACHE_SQLITE_PATH")
+    if sqlite_path:
+        try:
+            backend = SQLiteBackend(sqlite_path, max_rows=int(os.getenv("LLM_CACHE_SQLITE_MAX_ROWS", "100000")))
+        except sqlite3.Error as e:
+            logger.error(f"Could not open LLM cache at {sqlite_path}, using memory only: {e}", exc_info=True)
+    return ResponseCache(
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024")),
+        ttl=float(os.getenv("LLM_CACHE_TTL", "3600")),
+        backend=backend,
+    )
+
+
+response_cache = _build_cache()
@@ -1,121 +1,208 @@
-from configs.config import groq_client
+import os
+import threading
+import time
+from configs.config import get_groq_client
+from services import prompt_builder
 from services.helper import logger 
+from services.llm_cache import response_cache, fingerprint
+from services.workout_parser import parse_workout_response
+from services import model_router
+from services.instrumentation import LLM_REQUEST_SECONDS, observe_llm_usage
 
-def generate_workout_llm_output(height, weight, plan, workout, activity):
-    llm_prompt = f"""You are a seasoned fitness trainer with 20+ years of experience.
-                A client comes to you with the following body metrics:
-                Height = {height}, Weight = {weight}, Plan = {plan}, Activity Level = {activity}
-                Today, they want to target the following muscle groups: {workout}
-                Based on their height, weight, and current plan, please provide them a workout routine for the day.
-                Respond only with JSON using this format (assume completion for all generated exercises, and 
-                assume X = # of sets, Y and Z represent start and end point for range of reps):
-                {{"exercise1": [X, Y, Z]}}
-                """
-                
-    try:
-        chat_completion = groq_client.chat.completions.create(
-            messages=[
-                    {
-                        "role": "user",
-                        "content": llm_prompt
-                    }
-            ], 
-            model="llama-3.3-70b-versatile",
-            response_format={"type": "json_object"}
-        )
-        response = chat_completion.choices[0].message.content
-        return response, llm_prompt
-    except Exception as e:
-        logger.error(f"LLM error {e}", exc_info=True)
-        return None, None
-
-def generate_workout_with_rag(user_id, workout_targets):
-    from services.user_services import read_user
-    from services.metric_services import read_latest_height
-    from services.workout_services import read_workouts_for_user
-    from services.exercise_services import get_exercises_by_muscle_group
-
-    user_info, user_ok = read_user(user_id)
-    if not user_ok or not user_info:
-        return None, "User not found"
-    plan = user_info.get("plan", "")
-    activity = user_info.get("activity_level", "")
-
-    metrics, metrics_ok = read_latest_height(user_id)
-    if not metrics_ok or not metrics:
-        return None, "User metrics not found"
-    height = metrics.get("height", "")
-    weight = metrics.get("weight", "")
-
-    from services.workout_services import read_workouts_for_user
-    workout_history, wh_ok = read_workouts_for_user(user_id)
-    if not wh_ok:
-        workout_history = []
-
-    last_workouts = workout_history[:3] if workout_history else []
-    workout_summary = " | ".join([
-        f"{w.get('date_generated', '')}: {w.get('muscles_targeted', '')}" for w in last_workouts
-    ])
-
-    all_exercises = []
-    for muscle in workout_targets:
-        exercises, ok = get_exercises_by_muscle_group(muscle)
-        if ok and exercises:
-            all_exercises.extend(exercises)
-
-    seen = set()
-    unique_exercises = []
-    for ex in all_exercises:
-        name = ex.get("exercise_name")
-        if name and name not in seen:
-            unique_exercises.append(ex)
-            seen.add(name)
-
-    exercise_context = "\n".join([
-        f"{ex['exercise_name']} (Primary: {', '.join(ex['primary_muscle_group'])}; Equipment: {ex['equipment']}; Difficulty: {ex['difficulty']})"
-        for ex in unique_exercises[:10]
-    ])
-
-
-    initial_prompt = f"""
-You are a seasoned fitness trainer with 20+ years of experience.\n
-A client comes to you with the following body metrics:\n
-Height = {height}, Weight = {weight}, Plan = {plan}, Activity Level = {activity}\n
-Today, they want to target the following muscle groups: {', '.join(workout_targets)}\n
-Their last 3 workouts were: {workout_summary if workout_summary else 'N/A'}\n
-Here are some exercises you can use:\n{exercise_context}\n
-Based on their history, metrics, and plan, generate a JSON workout routine for the day.\nRespond only with JSON using this format (assume completion for all generated exercises, and assume X = # of sets, Y and Z represent start and end point for range of reps):\n{{"exercise1": [X, Y, Z]}}
-"""
+JSON_MODE = {"type": "json_object"}
 
-    try:
-        chat_completion = groq_client.chat.completions.create(
+def chat_request(prompt, **options):
+    # make_call for model_router: one user message to whichever model the
+    # stage is routed to, with the attempt timeout the caller assigns.
+    def make_call(model):
+        return lambda timeout: get_groq_client().chat.completions.create(
             messages=[
-                {"role": "user", "content": initial_prompt}
+                {"role": "user", "content": prompt}
             ],
-            model="llama-3.3-70b-versatile",
-            response_format={"type": "json_object"}
+            model=model,
+            timeout=timeout,
+            **options
         )
-        draft_response = chat_completion.choices[0].message.content
-    except Exception as e:
-        logger.error(f"LLM error (initial draft) {e}", exc_info=True)
-        return None, "LLM error (initial draft)"
-
-    refine_prompt = f"""
-Refine the following workout for the user, considering their plan ({plan}), activity level ({activity}), and last 3 workouts ({workout_summary if workout_summary else 'N/A'}).\n
-Workout draft: {draft_response}\n
-Make sure to avoid overtraining the same muscle groups as previous days, and add variety if possible. Respond only with improved JSON.
-"""
+    return make_call
+
+def build_workout_prompt(height, weight, plan, workout, activity):
+    return prompt_builder.workout_prompt(height, weight, plan, workout, activity)
+
+def workout_cache_key(height, weight, plan, workout, activity):
+    return fingerprint("workout", model_router.route_for("workout").primary,
+                       height=height, weight=weight, plan=plan, workout=workout, activity=activity)
+
+def served_by_primary(stage, model):
+    # Cache keys name the stage's primary model, so answers from the
+    # fallback are not cached under them.
+    return model == model_router.route_for(stage).primary
+
+def build_rag_prompt(context, workout_targets):
+    return prompt_builder.rag_prompt(context, workout_targets)
+
+def build_refine_prompt(context, draft_response):
+    return prompt_builder.refine_prompt(context, draft_response)
+
+def build_single_pass_prompt(context, workout_targets):
+    # The draft prompt with the refine step's constraints folded in, so one
+    # completion does the work of two.
+    return prompt_builder.rag_prompt(context, workout_targets, extra_instructions=(
+        "Before answering, check the routine against their plan, activity level and recent workouts: avoid "
+        "overtraining the muscle groups they trained most recently, and add variety where possible. "
+    ))
+
+def rag_cache_key(context, workout_targets, strategy):
+    # Speculative generation ends in the same refined answer as draft-refine.
+    # Keyed on the primary models, so rerouting a stage starts a fresh cache;
+    # see served_by_primary.
+    if strategy == "single-pass":
+        kind, models = "rag_workout_single_pass", model_router.route_for("single-pass").primary
+    else:
+        kind = "rag_workout"
+        models = "+".join(model_router.route_for(stage).primary for stage in ("draft", "refine"))
+    return fingerprint(
+        kind, models,
+        height=context.height, weight=context.weight, plan=context.plan, activity=context.activity,
+        targets=list(workout_targets),
+        history=[[w.get("date_generated"), w.get("muscles_targeted")] for w in context.recent_workouts],
+        exercises=[ex["exercise_name"] for ex in context.exercises],
+    )
+
+GENERATION_STRATEGIES = ("single-pass", "draft-refine", "speculative")
+DEFAULT_GENERATION_STRATEGY = os.getenv("GENERATION_STRATEGY", "draft-refine")
+
+_stats_lock = threading.Lock()
+_generation_stats = {
+    strategy: {
+        "requests": 0, "errors": 0, "refine_errors": 0, "cache_hits": 0, "llm_calls": 0,
+        "latency_seconds_total": 0.0, "background_seconds_total": 0.0,
+        "prompt_tokens": 0, "completion_tokens": 0,
+    }
+    for strategy in GENERATION_STRATEGIES
+}
+
+def record_generation(strategy, **increments):
+    with _stats_lock:
+        stats = _generation_stats[strategy]
+        for key, value in increments.items():
+            stats[key] += value
+
+def completion_content(chat_completion, strategy, model):
+    usage = getattr(chat_completion, "usage", None)
+    observe_llm_usage(model, usage)
+    record_generation(
+        strategy, llm_calls=1,
+        prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+        completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+    )
+    return chat_completion.choices[0].message.content
+
+def get_generation_stats():
+    with _stats_lock:
+        snapshot = {strategy: dict(stats) for strategy, stats in _generation_stats.items()}
+    for stats in snapshot.values():
+        served = stats["requests"] - stats["errors"]
+        stats["avg_latency_seconds"] = stats["latency_seconds_total"] / served if served else 0.0
+        stats["avg_tokens_per_request"] = (stats["prompt_tokens"] + stats["completion_tokens"]) / served if served else 0.0
+    return snapshot
+
+def generate_workout_with_rag(user_id, workout_targets, use_cache=True, strategy=None, on_refined=None):
+    # Blocking wrapper around generate_workout_with_rag_async. Returns
+    # (response, prompt, model that produced the response); on failure the
+    # prompt slot carries the error message.
+    from services.async_llm import generation_service, generate_workout_with_rag_async
+
+    return generation_service.run(
+        generate_workout_with_rag_async, user_id, workout_targets,
+        use_cache=use_cache, strategy=strategy, on_refined=on_refined,
+    )
+
+def stream_workout_with_rag(user_id, workout_targets, use_cache=True):
+    # Yields (event, data) pairs: "exercise" for each entry as soon as it is
+    # complete, "token" for raw text, then "done" or "error". "done" carries
+    # workout_details from parse_workout_response, like /generate; a response
+    # that does not parse ends in "error" instead. Streaming uses
+    # the single-pass prompt since only one completion can be relayed live.
+    from services.context_services import load_generation_context
+    from services.stream_parser import IncrementalWorkoutParser
+
+    strategy = "single-pass"
+    start = time.perf_counter()
+    record_generation(strategy, requests=1)
+
+    context, context_ok = load_generation_context(user_id, workout_targets)
+    if not context_ok or not context or not context.user:
+        record_generation(strategy, errors=1)
+        yield "error", {"error": "User not found"}
+        return
+    if not context.latest_metric:
+        record_generation(strategy, errors=1)
+        yield "error", {"error": "User metrics not found"}
+        return
+
+    parser = IncrementalWorkoutParser()
+    cache_key = rag_cache_key(context, workout_targets, strategy)
+    cached = response_cache.get(cache_key) if use_cache else None
+    if cached is not None:
+        record_generation(strategy, cache_hits=1, latency_seconds_total=time.perf_counter() - start)
+        for name, value in parser.feed(cached["response"]):
+            yield "exercise", {"exercise": name, "value": value}
+        workout_doc, error = parse_workout_response(cached["response"])
+        if error:
+            yield "error", {"error": error, "llm_response": cached["response"]}
+            return
+        yield "done", {
+            "llm_response": cached["response"], "llm_prompt": cached["prompt"], "model": cached.get("model"),
+            "workout_details": workout_doc, "cached": True,
+        }
+        return
+
+    initial_prompt = build_single_pass_prompt(context, workout_targets)
+    chunks = []
+    model = model_router.route_for(strategy).primary
+    llm_start = time.perf_counter()
     try:
-        chat_completion2 = groq_client.chat.completions.create(
-            messages=[
-                {"role": "user", "content": refine_prompt}
-            ],
-            model="llama-3.3-70b-versatile",
-            response_format={"type": "json_object"}
-        )
-        refined_response = chat_completion2.choices[0].message.content
+        # JSON mode cannot be combined with streaming on Groq, so the prompt's
+        # "respond only with JSON" instruction has to carry it. Only opening
+        # the stream is retried; tokens already relayed cannot be taken back.
+        stream, model = model_router.call(strategy, chat_request(initial_prompt, stream=True), mode=None, hedge=False)
+        for chunk in stream:
+            text = chunk.choices[0].delta.content if chunk.choices else None
+            usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+            if usage is not None:
+                observe_llm_usage(model, usage)
+                record_generation(
+                    strategy,
+                    prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+                    completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+                )
+            if not text:
+                continue
+            chunks.append(text)
+            yield "token", {"text": text}
+            for name, value in parser.feed(text):
+                yield "exercise", {"exercise": name, "value": value}
     except Exception as e:
-        logger.error(f"LLM error (refinement) {e}", exc_info=True)
-        return draft_response, "LLM error (refinement)"
+        logger.error(f"LLM error (streaming) {e}", exc_info=True)
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - llm_start, model=model, mode="stream", outcome="error")
+        record_generation(strategy, errors=1)
+        yield "error", {"error": "LLM error (streaming)"}
+        return
 
-    return refined_response, initial_prompt
+    LLM_REQUEST_SECONDS.observe(time.perf_counter() - llm_start, model=model, mode="stream", outcome="ok")
+    response = "".join(chunks)
+    record_generation(strategy, llm_calls=1, latency_seconds_total=time.perf_counter() - start)
+    if parser.finished:
+        # Drop any chatter around the object so the stored response parses
+        # the same as a JSON-mode completion.
+        response = response[response.find("{"):response.rfind("}") + 1]
+    workout_doc, error = parse_workout_response(response)
+    if error:
+        yield "error", {"error": error, "llm_response": response}
+        return
+    if parser.finished and served_by_primary(strategy, model):
+        response_cache.set(cache_key, {"response": response, "prompt": initial_prompt, "model": model})
+    yield "done", {
+        "llm_response": response, "llm_prompt": initial_prompt, "model": model,
+        "workout_details": workout_doc, "cached": False,
+    }
@@ -0,0 +1,316 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from services.helper import logger
+from services.instrumentation import LLM_RESILIENCE_EVENTS
+
+# Total time one logical call may take, across retries and hedges, and the
+# cap on a single attempt within it.
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "45"))
+LLM_ATTEMPT_TIMEOUT = float(os.getenv("LLM_ATTEMPT_TIMEOUT", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.25"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "4"))
+# Hedging sends a duplicate request when the first has not answered by the
+# observed p95 (or LLM_HEDGE_AFTER_SECONDS if set). Off by default since every
+# hedge can double the tokens spent on a slow call.
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "0").lower() in ("1", "true", "yes")
+LLM_HEDGE_AFTER_SECONDS = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", "0"))
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+LLM_HEDGE_MIN_SAMPLES = 20
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+RETRYABLE_STATUS = (408, 409, 429)
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    pass
+
+
+def _event(model, event):
+    LLM_RESILIENCE_EVENTS.inc(model=model, event=event)
+
+
+def is_retryable(error):
+    # Checked by name and status code so the groq SDK does not have to be
+    # imported here.
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if type(error).__name__ in ("APITimeoutError", "APIConnectionError"):
+        return True
+    status = getattr(error, "status_code", None)
+    return isinstance(status, int) and (status in RETRYABLE_STATUS or status >= 500)
+
+
+def _retry_after(error):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return min(float(headers.get("retry-after")), LLM_RETRY_MAX_DELAY)
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff(attempt):
+    # Full jitter: uniform over [0, base * 2^attempt], capped.
+    return random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** attempt))
+
+
+class CircuitBreaker:
+    # closed -> open after `failure_threshold` consecutive retryable failures;
+    # open -> half_open after `reset_after` seconds, letting one probe call
+    # through; the probe's outcome closes or re-opens it.
+
+    def __init__(self, model, failure_threshold=LLM_BREAKER_FAILURE_THRESHOLD, reset_after=LLM_BREAKER_RESET_SECONDS):
+        self.model = model
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_after:
+                self.state = "half_open"
+                self._probing = False
+                _event(self.model, "breaker_half_open")
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                _event(self.model, "breaker_closed")
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+
+    def release_probe(self):
+        # For an attempt that ended without an outcome (cancelled), so the
+        # half-open probe slot is not held forever.
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self._probing = False
+                _event(self.model, "breaker_opened")
+                logger.error(f"Circuit breaker opened for {self.model} after {self.failures} failures")
+
+
+class LatencyTracker:
+    # Recent successful attempt latencies, for the hedging threshold.
+
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q):
+        with self._lock:
+            if len(self._samples) < LLM_HEDGE_MIN_SAMPLES:
+                return None
+            samples = sorted(self._samples)
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class ResilientCaller:
+    # Wraps one provider call, given as fn(timeout) (or an async fn), with a
+    # deadline, jittered retries, optional hedging and a per-model breaker.
+
+    def __init__(self, hedge_workers=int(os.getenv("LLM_HEDGE_WORKERS", "8"))):
+        self._breakers = {}
+        self._trackers = {}
+        self._lock = threading.Lock()
+        self._hedge_workers = hedge_workers
+        self._executor = None
+
+    def breaker(self, model):
+        with self._lock:
+            if model not in self._breakers:
+                self._breakers[model] = CircuitBreaker(model)
+            return self._breakers[model]
+
+    def tracker(self, model):
+        with self._lock:
+            if model not in self._trackers:
+                self._trackers[model] = LatencyTracker()
+            return self._trackers[model]
+
+    def hedge_delay(self, model):
+        if not LLM_HEDGE_ENABLED:
+            return None
+        if LLM_HEDGE_AFTER_SECONDS > 0:
+            return LLM_HEDGE_AFTER_SECONDS
+        return self.tracker(model).quantile(LLM_HEDGE_QUANTILE)
+
+    def stats(self):
+        with self._lock:
+            breakers = dict(self._breakers)
+        states = {"closed": 0, "half_open": 1, "open": 2}
+        return {model: states[b.state] for model, b in breakers.items()}
+
+    def _before_attempt(self, model, start, deadline):
+        remaining = deadline - (time.monotonic() - start)
+        if remaining <= 0:
+            _event(model, "deadline_exceeded")
+            raise LLMDeadlineExceeded(f"LLM call to {model} exceeded its {deadline:.0f}s deadline")
+        # Checked last: in half_open, allow() hands out the single probe slot.
+        breaker = self.breaker(model)
+        if not breaker.allow():
+            _event(model, "breaker_rejected")
+            raise CircuitOpenError(f"Circuit breaker is open for {model}")
+        _event(model, "attempt")
+        return breaker, min(LLM_ATTEMPT_TIMEOUT, remaining)
+
+    def _after_failure(self, model, breaker, error, attempt, start, deadline):
+        # Returns the delay before the next attempt, or re-raises.
+        if not is_retryable(error):
+            # The provider answered; the request itself was bad.
+            breaker.record_success()
+            _event(model, "non_retryable")
+            raise error
+        breaker.record_failure()
+        delay = _retry_after(error) or _backoff(attempt)
+        if attempt >= LLM_MAX_RETRIES:
+            _event(model, "retries_exhausted")
+            raise error
+        if time.monotonic() - start + delay >= deadline:
+            _event(model, "deadline_exceeded")
+            raise error
+        _event(model, "retry")
+        logger.warning(f"Retrying {model} in {delay:.2f}s after {type(error).__name__}: {error}")
+        return delay
+
+    def call(self, fn, model, deadline=LLM_DEADLINE_SECONDS, hedge=True):
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            breaker, timeout = self._before_attempt(model, start, deadline)
+            try:
+                result = self._attempt(fn, model, timeout, hedge)
+            except Exception as e:
+                time.sleep(self._after_failure(model, breaker, e, attempt, start, deadline))
+                attempt += 1
+                continue
+            except BaseException:
+                breaker.release_probe()
+                raise
+            breaker.record_success()
+            return result
+
+    async def call_async(self, fn, model, deadline=LLM_DEADLINE_SECONDS, hedge=True):
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            breaker, timeout = self._before_attempt(model, start, deadline)
+            try:
+                result = await self._attempt_async(fn, model, timeout, hedge)
+            except Exception as e:
+                await asyncio.sleep(self._after_failure(model, breaker, e, attempt, start, deadline))
+                attempt += 1
+                continue
+            except BaseException:
+                # CancelledError is not an Exception.
+                breaker.release_probe()
+                raise
+            breaker.record_success()
+            return result
+
+    def _attempt(self, fn, model, timeout, hedge):
+        delay = self.hedge_delay(model) if hedge else None
+        started = time.monotonic()
+        if delay is None or delay >= timeout:
+            result = fn(timeout)
+            self.tracker(model).observe(time.monotonic() - started)
+            return result
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self._hedge_workers, thread_name_prefix="llm-hedge")
+        # A sync HTTP call cannot be cancelled, so the losing request runs to
+        # completion on its worker thread and its result is dropped.
+        primary = self._executor.submit(fn, timeout)
+        pending = {primary}
+        done, pending = wait(pending, timeout=delay)
+        hedged = None
+        if not done:
+            _event(model, "hedge_started")
+            hedged = self._executor.submit(fn, timeout - delay)
+            pending.add(hedged)
+        error = None
+        while True:
+            for future in done:
+                if future.exception() is None:
+                    if future is hedged:
+                        _event(model, "hedge_won")
+                    self.tracker(model).observe(time.monotonic() - started)
+                    return future.result()
+                error = future.exception()
+            if not pending:
+                break
+            done, pending = wait(pending, timeout=max(0.0, timeout - (time.monotonic() - started)), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+        raise error or LLMDeadlineExceeded(f"LLM attempt to {model} timed out after {timeout:.1f}s")
+
+    async def _attempt_async(self, fn, model, timeout, hedge):
+        delay = self.hedge_delay(model) if hedge else None
+        started = time.monotonic()
+        if delay is None or delay >= timeout:
+            result = await asyncio.wait_for(fn(timeout), timeout)
+            self.tracker(model).observe(time.monotonic() - started)
+            return result
+        primary = asyncio.ensure_future(fn(timeout))
+        done, pending = await asyncio.wait({primary}, timeout=delay)
+        hedged = None
+        if not done:
+            _event(model, "hedge_started")
+            hedged = asyncio.ensure_future(fn(timeout - delay))
+            pending.add(hedged)
+        error = None
+        try:
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedged:
+                            _event(model, "hedge_won")
+                        self.tracker(model).observe(time.monotonic() - started)
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, timeout - (time.monotonic() - started)), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+        raise error or LLMDeadlineExceeded(f"LLM attempt to {model} timed out after {timeout:.1f}s")
+
+
+resilient_llm = ResilientCaller()
@@ -1,29 +1,178 @@
 from configs.config import get_db_connection
-from services.helper import db_operation_failed, check_row_count, logger
+from services.helper import db_operation_failed, check_row_count, logger, WriteStamps
 from psycopg2 import Error as Psycopg2Error
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+import os
+import threading
+import time
 import uuid
+from collections import OrderedDict
 from datetime import datetime
+from decimal import Decimal
+
+METRIC_FIELDS = ("height", "weight")
+SERIES_BUCKETS = ("day", "week", "month")
+# Aggregate templates; {col} is the metric column identifier.
+SERIES_AGGREGATIONS = {
+    "min": "min({col})",
+    "max": "max({col})",
+    "avg": "round(avg({col}), 2)",
+    "last": "(array_agg({col} ORDER BY recorded_at DESC))[1]",
+}
+MAX_BULK_METRICS = int(os.getenv("MAX_BULK_METRICS", "10000"))
+# metrics.height and metrics.weight are NUMERIC(5,2).
+MAX_METRIC_VALUE = 999.99
+
+# Resolves each incoming reading against the table in one statement: missing
+# height/weight are taken from the user's latest earlier reading, and rows for
+# unknown users, already-recorded timestamps or with nothing to fill from are
+# skipped instead of aborting the transaction. Duplicates are left to the
+# unique index on (user_id, recorded_at), so concurrent uploads of the same
+# reading insert it once. One output row per input row.
+BULK_INSERT_SQL = """
+WITH incoming (idx, user_id, height, weight, recorded_at) AS (VALUES %s),
+resolved AS (
+    SELECT i.idx, i.user_id, i.recorded_at,
+           COALESCE(i.height, prev.height) AS height,
+           COALESCE(i.weight, prev.weight) AS weight,
+           EXISTS (SELECT 1 FROM users u WHERE u.user_id = i.user_id) AS user_exists
+    FROM incoming i
+    LEFT JOIN LATERAL (
+        SELECT height, weight FROM metrics m
+        WHERE m.user_id = i.user_id AND m.recorded_at < i.recorded_at
+        ORDER BY m.recorded_at DESC LIMIT 1
+    ) prev ON TRUE
+),
+inserted AS (
+    INSERT INTO metrics (user_id, height, weight, recorded_at)
+    SELECT user_id, height, weight, recorded_at FROM resolved
+    WHERE user_exists AND height IS NOT NULL AND weight IS NOT NULL
+    ON CONFLICT (user_id, recorded_at) DO NOTHING
+    RETURNING metric_id, user_id, recorded_at
+)
+SELECT r.idx, ins.metric_id, r.user_exists,
+       ins.metric_id IS NULL AND r.height IS NOT NULL AND r.weight IS NOT NULL AS duplicate
+FROM resolved r
+LEFT JOIN inserted ins ON ins.user_id = r.user_id AND ins.recorded_at = r.recorded_at;
+"""
+
+class LatestMetricsCache:
+    # Per-user copy of the newest metrics row, kept current by create_metric
+    # (write-through) so reads after a write never touch the database. The TTL
+    # bounds staleness from writes made by other processes. Writes stamp the
+    # user they touch; fill() stores a row read from the database only if that
+    # user was not written since the read began, so it cannot replace a newer
+    # write-through or undo an invalidation, and writes for other users do not
+    # turn it away.
+
+    def __init__(self, ttl=300.0, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # user_id -> (metric_dict, stored_at)
+        self._lock = threading.Lock()
+        self._writes = WriteStamps(max_entries)
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "invalidations": 0, "stale_fills": 0}
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(str(user_id))
+            if entry is not None and time.monotonic() - entry[1] < self.ttl:
+                self._entries.move_to_end(str(user_id))
+                self.stats["hits"] += 1
+                return dict(entry[0])
+            self.stats["misses"] += 1
+            return None
+
+    def token(self):
+        with self._lock:
+            return self._writes.token()
+
+    def _store_locked(self, user_id, metric_dict):
+        self._entries[str(user_id)] = (dict(metric_dict), time.monotonic())
+        self._entries.move_to_end(str(user_id))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def set(self, user_id, metric_dict):
+        with self._lock:
+            self._writes.touch(str(user_id))
+            self._store_locked(user_id, metric_dict)
+            self.stats["writes"] += 1
+
+    def fill(self, user_id, metric_dict, token):
+        with self._lock:
+            if self._writes.changed_since(str(user_id), token):
+                self.stats["stale_fills"] += 1
+                return
+            self._store_locked(user_id, metric_dict)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._writes.touch(str(user_id))
+            self._entries.pop(str(user_id), None)
+            self.stats["invalidations"] += 1
+
+
+latest_metrics_cache = LatestMetricsCache(
+    ttl=float(os.getenv("LATEST_METRICS_CACHE_TTL", "300")),
+    max_entries=int(os.getenv("LATEST_METRICS_CACHE_MAX_ENTRIES", "10000")),
+)
+
+def _serialize_metric(metric_dict):
+    if 'metric_id' in metric_dict and isinstance(metric_dict['metric_id'], uuid.UUID):
+        metric_dict['metric_id'] = str(metric_dict['metric_id'])
+    if 'user_id' in metric_dict and isinstance(metric_dict['user_id'], uuid.UUID):
+        metric_dict['user_id'] = str(metric_dict['user_id'])
+    if 'recorded_at' in metric_dict and isinstance(metric_dict['recorded_at'], datetime):
+        metric_dict['recorded_at'] = metric_dict['recorded_at'].isoformat()
+    return metric_dict
 
 def create_metric(user_id, timestamp, height, weight):
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cur:
+                # is_latest is evaluated against the rows that existed before
+                # this insert, so a backdated reading does not replace the
+                # cached latest one. A reading already recorded at the same
+                # timestamp is kept, as in create_metrics_bulk.
                 insert_sql = """
                 INSERT INTO metrics (user_id, height, weight, recorded_at)
-                VALUES (%s, %s, %s, %s)
-                RETURNING metric_id;
+                VALUES (%(user_id)s, %(height)s, %(weight)s, %(recorded_at)s)
+                ON CONFLICT (user_id, recorded_at) DO NOTHING
+                RETURNING metric_id, user_id, height, weight, recorded_at,
+                    NOT EXISTS (
+                        SELECT 1 FROM metrics
+                        WHERE user_id = %(user_id)s AND recorded_at > %(recorded_at)s
+                    ) AS is_latest;
                 """
-                cur.execute(insert_sql, (user_id, height, weight, timestamp))
-                created_metric_id = cur.fetchone()[0]
+                cur.execute(insert_sql, {"user_id": user_id, "height": height, "weight": weight, "recorded_at": timestamp})
+                row = cur.fetchone()
+                if row is None:
+                    cur.execute(
+                        "SELECT metric_id FROM metrics WHERE user_id = %s AND recorded_at = %s;", (user_id, timestamp)
+                    )
+                    existing = cur.fetchone()
+                    conn.commit()
+                    logger.info(f"Metric for user {user_id} at {timestamp} already recorded; keeping the existing row")
+                    return {"_id": str(existing[0])}, True
                 conn.commit()
-                return {"_id": str(created_metric_id)}, True
+                columns = [desc[0] for desc in cur.description]
+                metric_dict = dict(zip(columns, row))
+                if metric_dict.pop("is_latest"):
+                    latest_metrics_cache.set(user_id, _serialize_metric(metric_dict))
+                return {"_id": str(metric_dict["metric_id"])}, True
     except Psycopg2Error as e:
         return db_operation_failed(e, "create metric")
     except Exception as e:
         logger.critical(f"Unexpected error when creating metric: {e}", exc_info=True)
         return None, False
 
-def read_latest_height(user_id):
+def read_latest_metrics(user_id):
+    cached = latest_metrics_cache.get(user_id)
+    if cached is not None:
+        return cached, True
+    token = latest_metrics_cache.token()
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cur:
@@ -36,60 +185,160 @@ def read_latest_height(user_id):
                 latest_doc = cur.fetchone()
                 if latest_doc:
                     columns = [desc[0] for desc in cur.description]
-                    metric_dict = dict(zip(columns, latest_doc))
-
-                    if 'metric_id' in metric_dict and isinstance(metric_dict['metric_id'], uuid.UUID):
-                        metric_dict['metric_id'] = str(metric_dict['metric_id'])
-                    if 'user_id' in metric_dict and isinstance(metric_dict['user_id'], uuid.UUID):
-                        metric_dict['user_id'] = str(metric_dict['user_id'])
-                    if 'recorded_at' in metric_dict and isinstance(metric_dict['recorded_at'], datetime):
-                        metric_dict['recorded_at'] = metric_dict['recorded_at'].isoformat()
-                    return metric_dict, True
+                    metric_dict = _serialize_metric(dict(zip(columns, latest_doc)))
+                    latest_metrics_cache.fill(user_id, metric_dict, token)
+                    return dict(metric_dict), True
                 return None, False
     except Psycopg2Error as e:
-        return db_operation_failed(e, "read latest height")
+        return db_operation_failed(e, "read latest metrics")
     except Exception as e:
-        logger.critical(f"Unexpected error in read_latest_height: {e}", exc_info=True)
+        logger.critical(f"Unexpected error in read_latest_metrics: {e}", exc_info=True)
         return None, False
 
-def read_latest_weight(user_id):
+# Height and weight live in the same row; kept for existing callers.
+read_latest_height = read_latest_metrics
+read_latest_weight = read_latest_metrics
+
+def validate_series_params(bucket, fields, aggregations):
+    if bucket not in SERIES_BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(SERIES_BUCKETS)}")
+    fields = tuple(fields)
+    aggregations = tuple(aggregations)
+    unknown = [f for f in fields if f not in METRIC_FIELDS] + [a for a in aggregations if a not in SERIES_AGGREGATIONS]
+    if unknown or not fields or not aggregations:
+        raise ValueError(f"Invalid series fields/aggregations: {', '.join(unknown) or 'none requested'}")
+    return bucket, fields, aggregations
+
+def read_metric_series(user_id, start=None, end=None, bucket="day", fields=("weight",), aggregations=("avg",)):
+    # One row per bucket, aggregated in Postgres, returned as parallel arrays:
+    # {"bucket": [...], "count": [...], "weight_avg": [...], ...}. Buckets are
+    # UTC calendar days/ISO weeks/months, labelled by their first day.
+    bucket, fields, aggregations = validate_series_params(bucket, fields, aggregations)
+    columns = [(f"{field}_{agg}", SERIES_AGGREGATIONS[agg].format(col="{" + field + "}")) for field in fields for agg in aggregations]
+    select_list = sql.SQL(", ").join(
+        sql.SQL(template + " AS {alias}").format(**{field: sql.Identifier(field) for field in fields}, alias=sql.Identifier(alias))
+        for alias, template in columns
+    )
+    select_sql = sql.SQL("""
+    SELECT date_trunc(%(bucket)s, recorded_at AT TIME ZONE 'UTC') AS bucket, count(*) AS count, {select_list}
+    FROM metrics
+    WHERE user_id = %(user_id)s
+      AND (%(start)s::timestamptz IS NULL OR recorded_at >= %(start)s::timestamptz)
+      AND (%(end)s::timestamptz IS NULL OR recorded_at < %(end)s::timestamptz)
+    GROUP BY 1
+    ORDER BY 1;
+    """).format(select_list=select_list)
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cur:
-                select_sql = """
-                SELECT metric_id, user_id, height, weight, recorded_at
-                FROM metrics WHERE user_id = %s
-                ORDER BY recorded_at DESC LIMIT 1;
-                """
-                cur.execute(select_sql, (user_id,))
-                latest_doc = cur.fetchone()
-                if latest_doc:
-                    columns = [desc[0] for desc in cur.description]
-                    metric_dict = dict(zip(columns, latest_doc))
-
-                    if 'metric_id' in metric_dict and isinstance(metric_dict['metric_id'], uuid.UUID):
-                        metric_dict['metric_id'] = str(metric_dict['metric_id'])
-                    if 'user_id' in metric_dict and isinstance(metric_dict['user_id'], uuid.UUID):
-                        metric_dict['user_id'] = str(metric_dict['user_id'])
-                    if 'recorded_at' in metric_dict and isinstance(metric_dict['recorded_at'], datetime):
-                        metric_dict['recorded_at'] = metric_dict['recorded_at'].isoformat()
-                    return metric_dict, True
-                return None, False
+                cur.execute(select_sql, {"bucket": bucket, "user_id": user_id, "start": start, "end": end})
+                rows = cur.fetchall()
+                names = [desc[0] for desc in cur.description]
+        series = {name: [] for name in names}
+        for row in rows:
+            for name, value in zip(names, row):
+                if isinstance(value, datetime):
+                    value = value.date().isoformat()
+                elif isinstance(value, Decimal):
+                    value = float(value)
+                series[name].append(value)
+        return series, True
+    except Psycopg2Error as e:
+        return db_operation_failed(e, "read metric series")
+    except Exception as e:
+        logger.critical(f"Unexpected error in read_metric_series: {e}", exc_info=True)
+        return None, False
+
+def validate_metric_readings(readings):
+    # Single pass over the payload. Returns (rows, outcomes): rows are
+    # (idx, user_id, height, weight, recorded_at) for readings worth sending to
+    # the database, outcomes hold a result for every reading rejected here.
+    # Within a user's readings a missing value is carried forward from the
+    # previous one; only each user's earliest gaps are left for the database.
+    outcomes = {}
+    seen = set()
+    rows = []
+    for idx, reading in enumerate(readings):
+        if not isinstance(reading, dict):
+            outcomes[idx] = {"index": idx, "status": "invalid", "error": "Reading is not a JSON object."}
+            continue
+        try:
+            try:
+                user_id = str(uuid.UUID(str(reading.get("user_id"))))
+            except ValueError:
+                raise ValueError("user_id is not a valid UUID")
+            recorded_at = reading.get("recorded_at")
+            if not recorded_at:
+                raise ValueError("recorded_at is required")
+            recorded_at = datetime.fromisoformat(recorded_at)
+            height = reading.get("height")
+            weight = reading.get("weight")
+            if height is None and weight is None:
+                raise ValueError("height or weight is required")
+            height = int(height) if height is not None else None
+            weight = round(float(weight), 2) if weight is not None else None
+            for value in (height, weight):
+                if value is not None and not 0 < value <= MAX_METRIC_VALUE:
+                    raise ValueError(f"height and weight must be between 0 and {MAX_METRIC_VALUE}")
+        except (ValueError, TypeError) as e:
+            outcomes[idx] = {"index": idx, "status": "invalid", "error": str(e)}
+            continue
+        key = (user_id, recorded_at)
+        if key in seen:
+            outcomes[idx] = {"index": idx, "status": "duplicate"}
+            continue
+        seen.add(key)
+        rows.append([idx, user_id, height, weight, recorded_at])
+
+    rows.sort(key=lambda row: (row[1], row[4].timestamp()))
+    previous = {}
+    for row in rows:
+        last = previous.get(row[1])
+        if last is not None:
+            row[2] = row[2] if row[2] is not None else last[2]
+            row[3] = row[3] if row[3] is not None else last[3]
+        previous[row[1]] = row
+    return [tuple(row) for row in rows], outcomes
+
+def create_metrics_bulk(readings):
+    rows, outcomes = validate_metric_readings(readings)
+    try:
+        if rows:
+            with get_db_connection() as conn:
+                with conn.cursor() as cur:
+                    results = execute_values(
+                        cur, BULK_INSERT_SQL, rows,
+                        template="(%s, %s::uuid, %s::numeric, %s::numeric, %s::timestamptz)",
+                        page_size=1000, fetch=True,
+                    )
+                    conn.commit()
+            for idx, metric_id, user_exists, duplicate in results:
+                if metric_id is not None:
+                    outcomes[idx] = {"index": idx, "status": "inserted", "metric_id": str(metric_id)}
+                elif not user_exists:
+                    outcomes[idx] = {"index": idx, "status": "invalid", "error": "User not found."}
+                elif duplicate:
+                    outcomes[idx] = {"index": idx, "status": "duplicate"}
+                else:
+                    outcomes[idx] = {"index": idx, "status": "invalid", "error": "No earlier reading to fill the missing height or weight from."}
+            for user_id in {row[1] for row in rows}:
+                latest_metrics_cache.invalidate(user_id)
+        return [outcomes[idx] for idx in range(len(readings))], True
     except Psycopg2Error as e:
-        return db_operation_failed(e, "read latest weight")
+        return db_operation_failed(e, "bulk create metrics")
     except Exception as e:
-        logger.critical(f"Unexpected error in read_latest_weight: {e}", exc_info=True)
+        logger.critical(f"Unexpected error when bulk creating metrics: {e}", exc_info=True)
         return None, False
 
 def update_height(user_id, new_height, timestamp):
-    result, success = read_latest_weight(user_id)
+    result, success = read_latest_metrics(user_id)
     current_weight = result.get("weight") if result else None
     if not success:
         return None, False
     return create_metric(user_id, timestamp, new_height, current_weight)
 
 def update_weight(user_id, new_weight, timestamp):
-    result, success = read_latest_height(user_id)
+    result, success = read_latest_metrics(user_id)
     current_height = result.get("height") if result else None
     if not success:
         return None, False
@@ -102,6 +351,7 @@ def delete_user_metrics(user_id):
                 delete_sql = "DELETE FROM metrics WHERE user_id = %s;"
                 cur.execute(delete_sql, (user_id,))
                 conn.commit()
+                latest_metrics_cache.invalidate(user_id)
                 return check_row_count(cur.rowcount), True
     except Psycopg2Error as e:
         return db_operation_failed(e, "delete user metrics")
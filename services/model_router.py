@@ -0,0 +1,107 @@
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+from services.helper import logger
+from services.instrumentation import LLM_MODEL_FALLBACKS, LLM_REQUEST_SECONDS
+from services.llm_resilience import resilient_llm, CircuitOpenError, LLM_DEADLINE_SECONDS
+
+LARGE_MODEL = "llama-3.3-70b-versatile"
+FAST_MODEL = "llama-3.1-8b-instant"
+
+# Pipeline stage -> (primary, fallback). Refinement is mostly constraint
+# checking against an existing draft, so it runs on the fast model and only
+# falls back to the large one; the stages that write the workout do the
+# opposite. Override per stage with LLM_MODEL_<STAGE> and
+# LLM_FALLBACK_MODEL_<STAGE> (empty disables the fallback).
+STAGE_DEFAULTS = {
+    "workout": (LARGE_MODEL, FAST_MODEL),
+    "draft": (LARGE_MODEL, FAST_MODEL),
+    "single-pass": (LARGE_MODEL, FAST_MODEL),
+    "refine": (FAST_MODEL, LARGE_MODEL),
+}
+# How long the primary gets before the fallback is tried instead; the
+# fallback gets whatever is left of LLM_DEADLINE_SECONDS.
+LLM_FALLBACK_AFTER_SECONDS = float(os.getenv("LLM_FALLBACK_AFTER_SECONDS", "20"))
+
+
+@dataclass(frozen=True)
+class ModelRoute:
+    stage: str
+    primary: str
+    fallback: Optional[str] = None
+
+
+def load_routes():
+    routes = {}
+    for stage, (primary, fallback) in STAGE_DEFAULTS.items():
+        env_stage = stage.upper().replace("-", "_")
+        primary = os.getenv(f"LLM_MODEL_{env_stage}", primary)
+        fallback = os.getenv(f"LLM_FALLBACK_MODEL_{env_stage}", fallback) or None
+        routes[stage] = ModelRoute(stage, primary, fallback if fallback != primary else None)
+    return routes
+
+
+MODEL_ROUTES = load_routes()
+
+
+def route_for(stage):
+    return MODEL_ROUTES[stage]
+
+
+def _timed(fn, model, mode):
+    if mode is None:
+        return fn
+
+    def call(timeout):
+        with LLM_REQUEST_SECONDS.time(model=model, mode=mode):
+            return fn(timeout)
+    return call
+
+
+def _timed_async(fn, model, mode):
+    async def call(timeout):
+        with LLM_REQUEST_SECONDS.time(model=model, mode=mode):
+            return await fn(timeout)
+    return call
+
+
+def _primary_deadline(route):
+    return min(LLM_FALLBACK_AFTER_SECONDS, LLM_DEADLINE_SECONDS) if route.fallback else LLM_DEADLINE_SECONDS
+
+
+def _fall_back(route, error, start):
+    reason = "circuit_open" if isinstance(error, CircuitOpenError) else "timeout" if isinstance(error, TimeoutError) else "error"
+    LLM_MODEL_FALLBACKS.inc(stage=route.stage, model=route.primary, reason=reason)
+    logger.warning(f"Falling back from {route.primary} to {route.fallback} for {route.stage} ({reason}: {error})")
+    return LLM_DEADLINE_SECONDS - (time.monotonic() - start)
+
+
+def call(stage, make_call, mode="sync", hedge=True):
+    # make_call(model) -> fn(timeout). Returns (result, model that served it).
+    # mode=None leaves timing to the caller (streams outlive this call).
+    route = MODEL_ROUTES[stage]
+    start = time.monotonic()
+    try:
+        fn = _timed(make_call(route.primary), route.primary, mode)
+        return resilient_llm.call(fn, route.primary, deadline=_primary_deadline(route), hedge=hedge), route.primary
+    except Exception as e:
+        if route.fallback is None:
+            raise
+        remaining = _fall_back(route, e, start)
+    fn = _timed(make_call(route.fallback), route.fallback, mode)
+    return resilient_llm.call(fn, route.fallback, deadline=remaining, hedge=hedge), route.fallback
+
+
+async def call_async(stage, make_call, mode="async", hedge=True):
+    route = MODEL_ROUTES[stage]
+    start = time.monotonic()
+    try:
+        fn = _timed_async(make_call(route.primary), route.primary, mode)
+        return await resilient_llm.call_async(fn, route.primary, deadline=_primary_deadline(route), hedge=hedge), route.primary
+    except Exception as e:
+        if route.fallback is None:
+            raise
+        remaining = _fall_back(route, e, start)
+    fn = _timed_async(make_call(route.fallback), route.fallback, mode)
+    return await resilient_llm.call_async(fn, route.fallback, deadline=remaining, hedge=hedge), route.fallback
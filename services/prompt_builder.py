@@ -0,0 +1,135 @@
+import os
+import re
+from services.instrumentation import LLM_PROMPT_TOKENS, PROMPT_SECTIONS_TRIMMED
+
+# Per-section token budgets. Sections are cut at line boundaries, so history
+# loses its oldest workouts and candidates their lowest ranked exercises.
+SECTION_BUDGETS = {
+    "profile": int(os.getenv("PROMPT_BUDGET_PROFILE", "80")),
+    "history": int(os.getenv("PROMPT_BUDGET_HISTORY", "150")),
+    "candidates": int(os.getenv("PROMPT_BUDGET_CANDIDATES", "500")),
+}
+
+# Approximates the Llama 3 BPE pre-tokenizer: letters, digit groups of up to
+# three, punctuation runs and whitespace. Common words are one token, longer
+# ones are charged a token per six letters. An estimate for budgeting without
+# shipping a tokenizer; llm_tokens_total has Groq's exact counts to compare.
+_PIECES = re.compile(r"'(?:s|t|re|ve|m|ll|d)| ?[^\W\d_]+| ?\d{1,3}| ?[^\s\w]+|\s+")
+
+PREAMBLE = "You are a seasoned fitness trainer with 20+ years of experience."
+CANDIDATE_HEADER = "name|primary|secondary|equipment|level"
+
+JSON_FORMAT = (
+    'Respond only with JSON in this format (assume completion for all generated exercises; '
+    'X = number of sets, Y and Z are the start and end of the rep range): {"exercise1": [X, Y, Z]}'
+)
+
+
+def count_tokens(text):
+    tokens = 0
+    for piece in _PIECES.findall(text or ""):
+        stripped = piece.strip()
+        if not stripped:
+            tokens += 1 if "\n" in piece else 0
+        elif stripped[0].isalpha():
+            tokens += max(1, -(-len(stripped) // 6))
+        elif stripped[0].isdigit():
+            tokens += 1
+        else:
+            tokens += -(-len(stripped) // 2)
+    return tokens
+
+
+def fit_lines(lines, budget, header=None):
+    # Keeps lines in order until the budget is spent and returns the text and
+    # how many lines were dropped. The header only appears if a line fits.
+    used = count_tokens(header) + 1 if header else 0
+    kept = []
+    for line in lines:
+        cost = count_tokens(line) + 1
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    text = "\n".join(([header] if header else []) + kept) if kept else ""
+    return text, len(lines) - len(kept)
+
+
+def _cell(value):
+    if isinstance(value, (list, tuple)):
+        value = ",".join(str(v) for v in value)
+    return str(value or "-").replace("|", "/").replace("\n", " ")
+
+
+def encode_candidates(exercises):
+    return [
+        "|".join(_cell(ex.get(field)) for field in (
+            "exercise_name", "primary_muscle_group", "secondary_muscle_group", "equipment", "difficulty"
+        ))
+        for ex in exercises
+    ]
+
+
+def encode_history(recent_workouts):
+    # Newest first, so trimming drops the oldest.
+    return [
+        f"{str(w.get('date_generated') or '')[:10]}: {w.get('muscles_targeted') or ''}"
+        for w in recent_workouts
+    ]
+
+
+def encode_profile(height, weight, plan, activity, targets):
+    return [
+        f"Client: height={height}, weight={weight}, plan={plan}, activity={activity}",
+        f"Target today: {targets}",
+    ]
+
+
+def assemble(kind, sections):
+    # sections: (name, content, header) in prompt order. A list of lines is
+    # trimmed to SECTION_BUDGETS[name]; a string is used as is.
+    parts = []
+    for name, content, header in sections:
+        if isinstance(content, list):
+            text, dropped = fit_lines(content, SECTION_BUDGETS[name], header)
+            if dropped:
+                PROMPT_SECTIONS_TRIMMED.inc(kind=kind, section=name)
+        else:
+            text = content
+        if text:
+            LLM_PROMPT_TOKENS.observe(count_tokens(text), kind=kind, section=name)
+            parts.append(text)
+    prompt = "\n".join(parts)
+    LLM_PROMPT_TOKENS.observe(count_tokens(prompt), kind=kind, section="total")
+    return prompt
+
+
+def workout_prompt(height, weight, plan, workout, activity):
+    return assemble("workout", [
+        ("preamble", PREAMBLE, None),
+        ("profile", encode_profile(height, weight, plan, activity, workout), None),
+        ("instructions", "Based on their height, weight and plan, give them a workout routine for the day. " + JSON_FORMAT, None),
+    ])
+
+
+def rag_prompt(context, workout_targets, extra_instructions=""):
+    return assemble("rag", [
+        ("preamble", PREAMBLE, None),
+        ("profile", encode_profile(
+            context.height, context.weight, context.plan, context.activity, ", ".join(workout_targets)
+        ), None),
+        ("history", encode_history(context.recent_workouts) or ["none"], "Recent workouts (date: muscles):"),
+        ("candidates", encode_candidates(context.exercises), "Exercises you can use:\n" + CANDIDATE_HEADER),
+        ("instructions", "Based on their history, metrics and plan, generate a JSON workout routine for the day. "
+                         + extra_instructions + JSON_FORMAT, None),
+    ])
+
+
+def refine_prompt(context, draft_response):
+    return assemble("refine", [
+        ("profile", [f"Refine this workout for a client on plan {context.plan}, activity level {context.activity}."], None),
+        ("history", encode_history(context.recent_workouts) or ["none"], "Recent workouts (date: muscles):"),
+        ("draft", f"Workout draft: {draft_response}", None),
+        ("instructions", "Avoid overtraining the muscle groups they trained most recently and add variety where "
+                         "possible. Respond only with the improved JSON.", None),
+    ])
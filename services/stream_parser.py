@@ -0,0 +1,95 @@
+import json
+
+
+class IncrementalWorkoutParser:
+    # Consumes the LLM's JSON a chunk at a time and hands back each top-level
+    # "exercise": value entry as soon as its value is complete, without
+    # waiting for the closing brace of the whole object. Text before the
+    # opening brace (e.g. "Here is your workout:") is skipped.
+
+    def __init__(self):
+        self._started = False
+        self._finished = False
+        self._depth = 0          # nesting depth inside the top-level object
+        self._in_string = False
+        self._escaped = False
+        self._buffer = []        # characters of the current key/value
+        self._key = None
+        self._expecting = "key"  # "key", "colon" or "value"
+
+    @property
+    def finished(self):
+        return self._finished
+
+    def feed(self, chunk):
+        entries = []
+        for ch in chunk:
+            if self._finished:
+                break
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                continue
+            entry = self._consume(ch)
+            if entry is not None:
+                entries.append(entry)
+        return entries
+
+    def _consume(self, ch):
+        if self._in_string:
+            self._buffer.append(ch)
+            if self._escaped:
+                self._escaped = False
+            elif ch == "\\":
+                self._escaped = True
+            elif ch == '"':
+                self._in_string = False
+                if self._expecting == "key" and self._depth == 0:
+                    self._key = json.loads("".join(self._buffer))
+                    self._buffer = []
+                    self._expecting = "colon"
+            return None
+
+        if self._expecting == "colon":
+            if ch == ":":
+                self._expecting = "value"
+            return None
+
+        if self._expecting == "key":
+            if ch == '"':
+                self._in_string = True
+                self._buffer = [ch]
+            elif ch == "}":
+                self._finished = True
+            return None
+
+        # Reading a value.
+        if self._depth == 0 and ch in ",}":
+            entry = self._emit()
+            if ch == "}":
+                self._finished = True
+            return entry
+        if ch == '"':
+            self._in_string = True
+        elif ch in "[{":
+            self._depth += 1
+        elif ch in "]}":
+            self._depth -= 1
+        self._buffer.append(ch)
+        if self._depth == 0 and ch in "]}":
+            # Containers end unambiguously; no need to wait for the comma.
+            return self._emit()
+        return None
+
+    def _emit(self):
+        raw = "".join(self._buffer).strip()
+        key = self._key
+        self._buffer = []
+        self._key = None
+        self._expecting = "key"
+        if not raw:
+            return None
+        try:
+            return key, json.loads(raw)
+        except json.JSONDecodeError:
+            return key, raw
@@ -0,0 +1,205 @@
+import ast
+import json
+import re
+from services.helper import logger
+from services.instrumentation import WORKOUT_PARSES
+
+MAX_SETS = 20
+MAX_REPS = 100
+
+# Keys the model uses for the exercise list when it wraps it in an object.
+WRAPPER_KEYS = ("workout", "workouts", "exercises", "routine", "workout_routine", "plan")
+NAME_KEYS = ("Exercise", "exercise", "name", "exercise_name")
+SETS_KEYS = ("Sets", "sets", "set_count")
+REPS_KEYS = ("Rep Range", "rep_range", "reps", "Reps", "repetitions")
+
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_FENCE = re.compile(r"^```[a-zA-Z]*\s*|\s*```$")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+# "3x8-12", "3 x 8 to 12", "3 sets of 10"
+_SETS_REPS = re.compile(r"^\s*(\d+)\s*(?:x|sets?\s*(?:of|x)?)\s*(.+)$", re.IGNORECASE)
+_RANGE = re.compile(r"^\s*(\d+)\s*(?:-|–|—|to)\s*(\d+)")
+
+
+class WorkoutParseError(ValueError):
+    pass
+
+
+def _load(response, repairs):
+    # Strict JSON first; then progressively more forgiving readings of the
+    # same text, recording each repair that was needed.
+    if not isinstance(response, str):
+        raise WorkoutParseError("AI response was not valid JSON.")
+    try:
+        return json.loads(response)
+    except json.JSONDecodeError:
+        pass
+    text = _FENCE.sub("", response.strip())
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if starts:
+        start = min(starts)
+        end = text.rfind("}" if text[start] == "{" else "]")
+        if end > start:
+            text = text[start:end + 1]
+    repairs.append("extracted JSON from surrounding text")
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    text = _TRAILING_COMMA.sub(r"\1", text)
+    repairs.append("removed trailing commas")
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    try:
+        # Single-quoted keys and values, i.e. a Python literal.
+        value = ast.literal_eval(text)
+        repairs.append("read as a Python literal")
+        return value
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        raise WorkoutParseError("AI response was not valid JSON.")
+
+
+def _int(value, what, repairs):
+    if isinstance(value, bool):
+        raise WorkoutParseError(f"{what} is not a number")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        match = _NUMBER.search(value)
+        if match and float(match.group()).is_integer():
+            repairs.append(f"read {what} from text")
+            return int(float(match.group()))
+    raise WorkoutParseError(f"{what} is not a whole number")
+
+
+def _rep_range(value, repairs):
+    if isinstance(value, (list, tuple)):
+        if len(value) == 2:
+            return _int(value[0], "rep min", repairs), _int(value[1], "rep max", repairs)
+        if len(value) == 1:
+            value = value[0]
+        else:
+            raise WorkoutParseError("rep range needs two values")
+    if isinstance(value, str):
+        match = _RANGE.match(value)
+        if match:
+            repairs.append("split rep range text")
+            return int(match.group(1)), int(match.group(2))
+    reps = _int(value, "reps", repairs)
+    return reps, reps
+
+
+def _first(entry, keys):
+    for key in keys:
+        if key in entry:
+            return entry[key]
+    return None
+
+
+def _sets_and_reps(value, repairs):
+    # The value side of one exercise, in any of the shapes the model uses.
+    if isinstance(value, dict):
+        sets = _first(value, SETS_KEYS)
+        reps = _first(value, REPS_KEYS)
+        if reps is None and "rep_min" in value and "rep_max" in value:
+            reps = [value["rep_min"], value["rep_max"]]
+        if sets is None or reps is None:
+            raise WorkoutParseError("missing sets or reps")
+        return _int(sets, "sets", repairs), _rep_range(reps, repairs)
+    if isinstance(value, (list, tuple)):
+        if len(value) == 3:
+            return _int(value[0], "sets", repairs), _rep_range(value[1:], repairs)
+        if len(value) == 2:
+            return _int(value[0], "sets", repairs), _rep_range(value[1], repairs)
+        raise WorkoutParseError(f"expected [sets, rep min, rep max], got {len(value)} values")
+    if isinstance(value, str):
+        match = _SETS_REPS.match(value)
+        if match:
+            repairs.append("split sets x reps text")
+            return int(match.group(1)), _rep_range(match.group(2).strip(), repairs)
+    raise WorkoutParseError("unrecognised sets/reps format")
+
+
+def _entries(data, repairs):
+    # (name, value) pairs from the top-level shapes: {"name": value},
+    # [{"Exercise": name, ...}], or either of those under a wrapper key.
+    if isinstance(data, dict) and len(data) == 1:
+        key, inner = next(iter(data.items()))
+        if str(key).lower() in WRAPPER_KEYS and isinstance(inner, (dict, list)):
+            repairs.append(f"unwrapped '{key}'")
+            data = inner
+    if isinstance(data, dict):
+        return list(data.items())
+    if isinstance(data, list):
+        entries = []
+        for item in data:
+            if isinstance(item, dict) and _first(item, NAME_KEYS) is not None:
+                entries.append((_first(item, NAME_KEYS), item))
+            elif isinstance(item, (list, tuple)) and len(item) == 4:
+                entries.append((item[0], list(item[1:])))
+            else:
+                entries.append((None, item))
+        return entries
+    raise WorkoutParseError("AI response was not a JSON object.")
+
+
+def normalize_workout(data):
+    # Returns (workout_doc, repairs) in the stored parsed_workout schema.
+    # Entries that cannot be repaired are dropped; the result is an error
+    # only if nothing usable is left.
+    repairs = []
+    workout_doc = []
+    seen = set()
+    for name, value in _entries(data, repairs):
+        name = str(name).strip() if name is not None else ""
+        if not name:
+            repairs.append("dropped an entry without a name")
+            continue
+        try:
+            sets, (rep_min, rep_max) = _sets_and_reps(value, repairs)
+        except WorkoutParseError as e:
+            logger.warning(f"Dropping exercise {name!r} from AI output: {e} ({value!r})")
+            repairs.append(f"dropped {name}")
+            continue
+        if rep_min > rep_max:
+            rep_min, rep_max = rep_max, rep_min
+            repairs.append("swapped rep range")
+        if not (1 <= sets <= MAX_SETS and 1 <= rep_min and rep_max <= MAX_REPS):
+            logger.warning(f"Dropping exercise {name!r} from AI output: out of range ({value!r})")
+            repairs.append(f"dropped {name}")
+            continue
+        if name.lower() in seen:
+            repairs.append(f"dropped duplicate {name}")
+            continue
+        seen.add(name.lower())
+        workout_doc.append({"Exercise": name, "Sets": sets, "Rep Range": [rep_min, rep_max]})
+    if not workout_doc:
+        raise WorkoutParseError("Failed to parse exercises from AI output.")
+    return workout_doc, repairs
+
+
+def parse_workout_response(response):
+    # Turns the LLM's {"exercise": [sets, rep_min, rep_max]} JSON (or a
+    # near miss of it) into the stored parsed_workout list.
+    # Returns (workout_doc, error_message).
+    repairs = []
+    try:
+        data = _load(response, repairs)
+        if isinstance(data, dict) and "error" in data:
+            error = data["error"]
+            WORKOUT_PARSES.inc(outcome="llm_error")
+            return None, error.get("message", "Unknown LLM API error") if isinstance(error, dict) else str(error)
+        workout_doc, entry_repairs = normalize_workout(data)
+    except WorkoutParseError as e:
+        logger.error(f"Could not parse LLM workout output: {e} Response: {str(response)[:500]!r}")
+        WORKOUT_PARSES.inc(outcome="failed")
+        return None, str(e)
+    repairs += entry_repairs
+    if repairs:
+        logger.info(f"Repaired LLM workout output: {'; '.join(dict.fromkeys(repairs))}")
+    WORKOUT_PARSES.inc(outcome="repaired" if repairs else "ok")
+    return workout_doc, None
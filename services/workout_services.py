@@ -1,25 +1,59 @@
 from configs.config import get_db_connection
-from services.helper import db_operation_failed, check_row_count, logger
+from services.helper import db_operation_failed, check_row_count, logger, encode_cursor, decode_cursor
 from psycopg2 import Error as Psycopg2Error
+from psycopg2 import sql
+from psycopg2.extras import execute_values
 import uuid
 from datetime import datetime
 import json
 
-def create_workout(user_id, date_generated, muscle_groups_targeted, llm_prompt, llm_raw_out, parsed_workout, status, completed_on):
+WORKOUT_COLUMNS = (
+    "workout_id", "user_id", "muscles_targeted", "llm_prompt", "llm_raw",
+    "parsed_workout", "date_generated", "status", "completed_on", "model"
+)
+# Cheap columns only; llm_prompt, llm_raw and parsed_workout can be large.
+SUMMARY_FIELDS = ("workout_id", "date_generated", "muscles_targeted")
+# Default projection for paged history: everything except the raw LLM blobs.
+LIST_FIELDS = ("workout_id", "user_id", "muscles_targeted", "parsed_workout", "date_generated", "status", "completed_on", "model")
+MAX_PAGE_LIMIT = 100
+
+def validate_workout_fields(fields):
+    fields = tuple(fields)
+    unknown = [f for f in fields if f not in WORKOUT_COLUMNS]
+    if unknown or not fields:
+        logger.error(f"Invalid workout fields requested: {unknown}")
+        raise ValueError(f"Invalid workout fields: {', '.join(unknown) or 'none requested'}")
+    return fields
+
+def workout_columns_sql(fields):
+    return sql.SQL(", ").join(sql.Identifier(f) for f in validate_workout_fields(fields))
+
+def _serialize_workout(workout_dict):
+    if 'workout_id' in workout_dict and isinstance(workout_dict['workout_id'], uuid.UUID):
+        workout_dict['workout_id'] = str(workout_dict['workout_id'])
+    if 'user_id' in workout_dict and isinstance(workout_dict['user_id'], uuid.UUID):
+        workout_dict['user_id'] = str(workout_dict['user_id'])
+    if 'date_generated' in workout_dict and isinstance(workout_dict['date_generated'], datetime):
+        workout_dict['date_generated'] = workout_dict['date_generated'].isoformat()
+    if 'completed_on' in workout_dict and isinstance(workout_dict['completed_on'], datetime):
+        workout_dict['completed_on'] = workout_dict['completed_on'].isoformat()
+    return workout_dict
+
+def create_workout(user_id, date_generated, muscle_groups_targeted, llm_prompt, llm_raw_out, parsed_workout, status, completed_on, model=None):
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cur:
                 insert_sql = """
                 INSERT INTO workouts (
                     user_id, muscles_targeted, llm_prompt, llm_raw,
-                    parsed_workout, date_generated, status, completed_on
+                    parsed_workout, date_generated, status, completed_on, model
                 )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
                 RETURNING workout_id;
                 """
                 cur.execute(insert_sql, (
                     user_id, muscle_groups_targeted, llm_prompt, llm_raw_out,
-                    json.dumps(parsed_workout), date_generated, status, completed_on
+                    json.dumps(parsed_workout), date_generated, status, completed_on, model
                 ))
                 created_workout_id = cur.fetchone()[0]
                 conn.commit()
@@ -30,13 +64,42 @@ def create_workout(user_id, date_generated, muscle_groups_targeted, llm_prompt,
         logger.critical(f"Unexpected error when creating workout: {e}", exc_info=True)
         return None, False
 
+def create_workouts(workouts):
+    # Bulk create_workout: each item is the same positional tuple create_workout
+    # takes. All rows are written in one transaction; ids come back in order.
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                insert_sql = """
+                INSERT INTO workouts (
+                    user_id, muscles_targeted, llm_prompt, llm_raw,
+                    parsed_workout, date_generated, status, completed_on, model
+                )
+                VALUES %s
+                RETURNING workout_id;
+                """
+                rows = [
+                    (user_id, muscle_groups_targeted, llm_prompt, llm_raw_out,
+                     json.dumps(parsed_workout), date_generated, status, completed_on, model)
+                    for user_id, date_generated, muscle_groups_targeted, llm_prompt, llm_raw_out, parsed_workout, status, completed_on, model
+                    in workouts
+                ]
+                created = execute_values(cur, insert_sql, rows, fetch=True, page_size=len(rows) or 1)
+                conn.commit()
+                return [{"_id": str(row[0])} for row in created], True
+    except Psycopg2Error as e:
+        return db_operation_failed(e, "create workouts")
+    except Exception as e:
+        logger.critical(f"Unexpected error when creating workouts: {e}", exc_info=True)
+        return None, False
+
 def read_workout_by_id(workout_id):
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cur:
                 select_sql = """
                 SELECT workout_id, user_id, muscles_targeted, llm_prompt, llm_raw,
-                       parsed_workout, date_generated, status, completed_on
+                       parsed_workout, date_generated, status, completed_on, model
                 FROM workouts WHERE workout_id = %s;
                 """
                 cur.execute(select_sql, (workout_id,))
@@ -68,7 +131,7 @@ def read_workouts_for_user(user_id):
             with conn.cursor() as cur:
                 select_sql = """
                 SELECT workout_id, user_id, muscles_targeted, llm_prompt, llm_raw,
-                       parsed_workout, date_generated, status, completed_on
+                       parsed_workout, date_generated, status, completed_on, model
                 FROM workouts WHERE user_id = %s
                 ORDER BY date_generated DESC;
                 """
@@ -95,13 +158,59 @@ def read_workouts_for_user(user_id):
         logger.critical(f"Unexpected error when reading workouts for user: {e}", exc_info=True)
         return [], False
 
+def read_workouts_page(user_id, limit=20, cursor=None, fields=LIST_FIELDS):
+    limit = max(1, min(int(limit), MAX_PAGE_LIMIT))
+    fields = validate_workout_fields(fields)
+    # The keyset columns are always selected so the next cursor can be built.
+    select_fields = tuple(dict.fromkeys(("workout_id", "date_generated") + fields))
+    after = None
+    if cursor:
+        decoded = decode_cursor(cursor)
+        if not isinstance(decoded, list) or len(decoded) != 2 or not all(isinstance(v, str) for v in decoded):
+            raise ValueError(f"Malformed cursor: {cursor}")
+        try:
+            after = (datetime.fromisoformat(decoded[0]), str(uuid.UUID(decoded[1])))
+        except ValueError as e:
+            raise ValueError(f"Malformed cursor: {cursor}") from e
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                if after is None:
+                    select_sql = sql.SQL("""
+                    SELECT {columns}
+                    FROM workouts WHERE user_id = %s
+                    ORDER BY date_generated DESC, workout_id DESC LIMIT %s;
+                    """).format(columns=workout_columns_sql(select_fields))
+                    cur.execute(select_sql, (user_id, limit + 1))
+                else:
+                    select_sql = sql.SQL("""
+                    SELECT {columns}
+                    FROM workouts WHERE user_id = %s
+                      AND (date_generated, workout_id) < (%s, %s)
+                    ORDER BY date_generated DESC, workout_id DESC LIMIT %s;
+                    """).format(columns=workout_columns_sql(select_fields))
+                    cur.execute(select_sql, (user_id, after[0], after[1], limit + 1))
+                rows = cur.fetchall()
+                columns = [desc[0] for desc in cur.description]
+                workouts = [_serialize_workout(dict(zip(columns, row))) for row in rows[:limit]]
+                next_cursor = None
+                if len(rows) > limit:
+                    last = workouts[-1]
+                    next_cursor = encode_cursor([last["date_generated"], last["workout_id"]])
+                return {"workouts": workouts, "next_cursor": next_cursor}, True
+    except Psycopg2Error as e:
+        return db_operation_failed(e, "read workouts page")
+    except Exception as e:
+        logger.critical(f"Unexpected error when reading workouts page: {e}", exc_info=True)
+        return None, False
+
 def read_latest_workout_for_user(user_id):
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cur:
                 select_sql = """
                 SELECT workout_id, user_id, muscles_targeted, llm_prompt, llm_raw,
-                       parsed_workout, date_generated, status, completed_on
+                       parsed_workout, date_generated, status, completed_on, model
                 FROM workouts WHERE user_id = %s
                 ORDER BY date_generated DESC LIMIT 1;
                 """
@@ -128,6 +237,23 @@ def read_latest_workout_for_user(user_id):
         logger.critical(f"Unexpected error when reading latest workout for user: {e}", exc_info=True)
         return None, False
 
+def update_workout_output(workout_id, llm_raw_out, parsed_workout, model=None):
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cur:
+                update_sql = """
+                UPDATE workouts SET llm_raw = %s, parsed_workout = %s, model = COALESCE(%s, model)
+                WHERE workout_id = %s;
+                """
+                cur.execute(update_sql, (llm_raw_out, json.dumps(parsed_workout), model, workout_id))
+                conn.commit()
+                return check_row_count(cur.rowcount), True
+    except Psycopg2Error as e:
+        return db_operation_failed(e, "update workout output")
+    except Exception as e:
+        logger.critical(f"Unexpected error when updating workout output: {e}", exc_info=True)
+        return False, False
+
 def complete_workout(workout_id, timestamp):
     try:
         with get_db_connection() as conn:
@@ -70,6 +70,55 @@ def format_workout_display(workout_details):
     display_str += "---------------------------------\n"
     return display_str
 
+def _iter_sse_events(response):
+    event, data_lines = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if line == "":
+            if data_lines:
+                yield event, json.loads("\n".join(data_lines))
+            event, data_lines = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
+
+def stream_generated_workout(workout_list):
+    rag_payload = {"user_id": current_user_id, "workout": workout_list}
+    try:
+        response = requests.post(FLASK_URL + "generate/stream", json=rag_payload, stream=True)
+    except requests.exceptions.ConnectionError as e:
+        print(f"ERROR: Connection to Flask API failed. Is the server running at {FLASK_URL}? Details: {e}")
+        exit(1)
+    if response.status_code != 200:
+        response_data, status_code = generic_response_handling(response)
+        display_response(response_data, status_code, "Failed to generate workout with AI.")
+        return False
+
+    print("\n--- AI-Generated Workout (streaming) ---")
+    count = 0
+    with response:
+        for event, data in _iter_sse_events(response):
+            if event == "exercise":
+                count += 1
+                value = data.get("value")
+                if isinstance(value, list) and len(value) == 3:
+                    print(f"{count}. {data.get('exercise')}: {value[0]} sets of {value[1]}-{value[2]} reps", flush=True)
+                else:
+                    print(f"{count}. {data.get('exercise')}: {value}", flush=True)
+            elif event == "error":
+                print(f"Failed to generate workout with AI: {data.get('error', 'unknown error')}")
+                return False
+            elif event == "done":
+                if count == 0:
+                    print(data.get("llm_response"))
+                print("\n--- LLM Prompt Used ---")
+                print(data.get("llm_prompt"))
+                return True
+    print("Stream ended before the workout was complete.")
+    return False
+
 def _get_user_info_input():
     username = input("Enter Username (optional): ").strip()
     password = input("Enter Password (optional, will be hashed): ").strip()
@@ -177,16 +226,7 @@ def create_user_and_initial_workout():
         display_response(response_data, status_code, "User created successfully!")
         muscle_groups = input("Enter muscle groups to target for initial workout (comma-separated): ").strip()
         workout_list = [mg.strip() for mg in muscle_groups.split(",") if mg.strip()]
-        rag_payload = {"user_id": current_user_id, "workout": workout_list}
-        rag_response = generic_request_handling(requests.post, FLASK_URL + "generate", json_payload=rag_payload)
-        rag_data, rag_status = generic_response_handling(rag_response)
-        if isinstance(rag_data, dict) and rag_status == 200 and rag_data.get("llm_response"):
-            print("\n--- AI-Generated Initial Workout ---")
-            print(rag_data["llm_response"])
-            print("\n--- LLM Prompt Used ---")
-            print(rag_data["llm_prompt"])
-        else:
-            print("Failed to generate initial workout with AI.")
+        stream_generated_workout(workout_list)
     else:
         display_response(response_data, status_code, "Failed to create user.")
 
@@ -283,27 +323,19 @@ def manage_metrics():
                 display_response(response_data, status_code, "Weight updated (new metric record created).")
             except ValueError: print("Invalid input.")
         elif choice == '4':
-            response_h = generic_request_handling(requests.get, FLASK_URL + f"metrics/height/latest/{current_user_id}")
-            data_h, status_h = generic_response_handling(response_h)
-            response_w = generic_request_handling(requests.get, FLASK_URL + f"metrics/weight/latest/{current_user_id}") 
-            data_w, status_w = generic_response_handling(response_w)
-            
+            response = generic_request_handling(requests.get, FLASK_URL + f"metrics/latest/{current_user_id}")
+            data, status = generic_response_handling(response)
+
             print("\n--- Latest Metrics ---")
-            if status_h == 200 and isinstance(data_h, dict) and data_h.get("User Info"):
-                print(f"Height: {data_h['User Info'].get('height', 'N/A')} recorded at {data_h['User Info'].get('recorded_at', 'N/A')}")
+            if status == 200 and isinstance(data, dict) and data.get("User Info"):
+                info = data["User Info"]
+                print(f"Height: {info.get('height', 'N/A')} recorded at {info.get('recorded_at', 'N/A')}")
+                print(f"Weight: {info.get('weight', 'N/A')} recorded at {info.get('recorded_at', 'N/A')}")
             else:
-                if isinstance(data_h, dict):
-                    print(f"Height: Not found ({data_h.get('error', 'N/A')})")
+                if isinstance(data, dict):
+                    print(f"Metrics: Not found ({data.get('error', 'N/A')})")
                 else:
-                    print("Height: Not found (unexpected response type)")
-            
-            if status_w == 200 and isinstance(data_w, dict) and data_w.get("User Info"):
-                print(f"Weight: {data_w['User Info'].get('weight', 'N/A')} recorded at {data_w['User Info'].get('recorded_at', 'N/A')}")
-            else:
-                if isinstance(data_w, dict):
-                    print(f"Weight: Not found ({data_w.get('error', 'N/A')})")
-                else:
-                    print("Weight: Not found (unexpected response type)")
+                    print("Metrics: Not found (unexpected response type)")
 
         elif choice == '5':
             confirm = input(f"Delete ALL metrics for user {current_user_id[:8]}...? (yes/no): ").strip().lower()
@@ -341,16 +373,7 @@ def manage_workouts():
                 return
             muscle_groups = input("Enter muscle groups to target (comma-separated): ").strip()
             workout_list = [mg.strip() for mg in muscle_groups.split(",") if mg.strip()]
-            rag_payload = {"user_id": current_user_id, "workout": workout_list}
-            rag_response = generic_request_handling(requests.post, FLASK_URL + "generate", json_payload=rag_payload)
-            rag_data, rag_status = generic_response_handling(rag_response)
-            if isinstance(rag_data, dict) and rag_status == 200 and rag_data.get("llm_response"):
-                print("\n--- AI-Generated Workout ---")
-                print(rag_data["llm_response"])
-                print("\n--- LLM Prompt Used ---")
-                print(rag_data["llm_prompt"])
-            else:
-                print("Failed to generate workout with AI.")
+            stream_generated_workout(workout_list)
         elif choice == '2':
             response = generic_request_handling(requests.get, FLASK_URL + f"workouts/latest/{current_user_id}") 
             response_data, status_code = generic_response_handling(response)
@@ -359,17 +382,25 @@ def manage_workouts():
             else:
                 display_response(response_data, status_code, "No latest workout found.")
         elif choice == '3':
-            response = generic_request_handling(requests.get, FLASK_URL + f"workouts/user/{current_user_id}") 
-            response_data, status_code = generic_response_handling(response)
-            if isinstance(response_data, list) and status_code == 200 and response_data:
-                for i, workout in enumerate(response_data):
-                    print(f"\n--- Workout {i+1} (ID: {workout.get('workout_id', 'N/A')}) ---")
+            url = FLASK_URL + f"workouts/user/{current_user_id}?fields=workout_id,date_generated,parsed_workout"
+            shown = 0
+            while True:
+                response = generic_request_handling(requests.get, url)
+                response_data, status_code = generic_response_handling(response)
+                if not (isinstance(response_data, dict) and status_code == 200):
+                    display_response(response_data, status_code, "No workouts found for user.")
+                    break
+                for workout in response_data.get("workouts", []):
+                    shown += 1
+                    print(f"\n--- Workout {shown} (ID: {workout.get('workout_id', 'N/A')}) ---")
                     if workout.get("parsed_workout"):
                         print(format_workout_display(workout["parsed_workout"]))
                     else:
                         print("No parsed workout details.")
-            else:
-                display_response(response_data, status_code, "No workouts found for user.")
+                next_cursor = response_data.get("next_cursor")
+                if not next_cursor or input("Show more workouts? (yes/no): ").strip().lower() != 'yes':
+                    break
+                url = FLASK_URL + f"workouts/user/{current_user_id}?fields=workout_id,date_generated,parsed_workout&cursor={next_cursor}"
         elif choice == '4':
             workout_id = input("Enter Workout ID to view: ").strip()
             response = generic_request_handling(requests.get, FLASK_URL + f"workouts/{workout_id}") 